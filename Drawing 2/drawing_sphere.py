@@ -1,14 +1,18 @@
+import functools
 import math
 import cairo
 
 WIDTH, HEIGHT = 1000, 1000
-surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, WIDTH, HEIGHT)
-context = cairo.Context(surface)
+
+# Decode each texture once, repeated draws reuse the same surface
+@functools.lru_cache(maxsize=None)
+def load_texture(texture_path):
+    return cairo.ImageSurface.create_from_png(texture_path)
 
 def draw_sphere(context, center_x, center_y, radius, texture_path):
     context.arc(center_x, center_y, radius, 0, 2 * math.pi)
 
-    texture_surface = cairo.ImageSurface.create_from_png(texture_path)
+    texture_surface = load_texture(texture_path)
     texture_pattern = cairo.SurfacePattern(texture_surface)
 
     img_width = texture_surface.get_width()
@@ -29,10 +33,14 @@ def draw_sphere(context, center_x, center_y, radius, texture_path):
     context.paint()
     context.restore()
 
-context.set_source_rgb(0.2,0.2,0.2)
-context.paint()
-draw_sphere(context, WIDTH // 2, HEIGHT // 2, 500, 'earth-1617121_1280.png')
+if __name__ == "__main__":
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, WIDTH, HEIGHT)
+    context = cairo.Context(surface)
+
+    context.set_source_rgb(0.2,0.2,0.2)
+    context.paint()
+    draw_sphere(context, WIDTH // 2, HEIGHT // 2, 500, 'earth-1617121_1280.png')
 
-surface.write_to_png('drawing_sphere.png')
+    surface.write_to_png('drawing_sphere.png')
 
-print('done')
\ No newline at end of file
+    print('done')
\ No newline at end of file
@@ -1,47 +1,338 @@
 from transformers import AutoTokenizer, AutoModel
 import torch
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+import functools
 import json
+import os
+import time
 
-# Load LaBSE model and tokenizer
-tokenizer = AutoTokenizer.from_pretrained("sentence-transformers/LaBSE")
-model = AutoModel.from_pretrained("sentence-transformers/LaBSE")
+from ann_index import IVFIndex, recall_report, vectors_digest
+from generate_email_addresses import INPUT_PATH, add_email_columns, read_roster
+from embedding_cache import EmbeddingCache
+from lexical_prefilter import lexical_candidate_pairs
+from result_writers import write_result_files
+from tiled_similarity import iter_sharded_pairs, iter_unit_pairs, normalize_embeddings
 
-# Assuming 'Other Names' column contains first names
-female_names = df[df['Gender'] == 'F']['Other Names'].str.split().str[0].unique()
-male_names = df[df['Gender'] == 'M']['Other Names'].str.split().str[0].unique()
+# Constants
+ROSTER_PATH = INPUT_PATH  # the same roster the email generator reads
+SIMILARITY_THRESHOLD = 0.5  # 50% similarity threshold
+BLOCK_SIZE = 2048  # rows/columns per tile, peak memory is about BLOCK_SIZE * BLOCK_SIZE floats
+MODEL_ID = "sentence-transformers/LaBSE"
+EMBEDDING_CACHE_DIR = "embedding_cache"
+USE_QUANTIZED_MODEL = False  # dynamic int8 quantized Linear layers for faster CPU inference
+QUANTIZED_MODEL_PATH = MODEL_ID.replace("/", "--") + ".int8.pt"  # the whole converted module, one file per model
+EMBEDDING_CACHE_ID = MODEL_ID + (":int8" if USE_QUANTIZED_MODEL else "") + ":masked-mean"  # change whenever the model or pooling changes
+EMBEDDING_BATCH_SIZE = 256  # names per forward pass
+USE_ANN_INDEX = False  # approximate nearest-neighbour search instead of exact all-pairs scoring
+ANN_INDEX_PATH = "female_names.ivf.npz"
+ANN_N_PROBE = 8  # clusters scanned per query, higher is slower but more accurate
+ANN_TOP_K = None  # keep at most this many matches per male name, None keeps all above the threshold
+ANN_RECALL_SAMPLE = 1000  # male names used to measure recall against exact search
+USE_LEXICAL_PREFILTER = False  # only embed and score pairs that share enough character n-grams
+LEXICAL_THRESHOLD = 0.3  # minimum character n-gram TF-IDF cosine similarity for a candidate pair
+LEXICAL_NGRAM_RANGE = (2, 3)
+OUTPUT_PATH = "E:/Downloads/similar_names"  # each format is written to OUTPUT_PATH.<format>
+OUTPUT_FORMATS = ("jsonl",)  # add "parquet" for a columnar copy (needs pyarrow)
+USE_SHARDED_SCORING = False  # split exact scoring of the male names across a process pool
+SHARD_WORKERS = os.cpu_count()
+THREADS_PER_WORKER = 1  # BLAS threads inside each worker, SHARD_WORKERS * THREADS_PER_WORKER should not exceed the cores
+USE_INCREMENTAL = False  # reuse the previous run's results and only score names that were added
+INCREMENTAL_STATE_DIR = "similarity_state"
 
 
-def compute_embeddings(names):
-    encoded_input = tokenizer(names.tolist(), padding=True, truncation=True, return_tensors='pt')
-    with torch.no_grad():
-        model_output = model(**encoded_input)
-    embeddings = model_output.last_hidden_state.mean(dim=1)
+def quantize_model(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# Load LaBSE model and tokenizer, only once and only when a name is not already cached.
+# The quantized module itself is pickled after the first conversion, so later runs load it without
+# reading the fp32 checkpoint or converting again.
+# The flag is normalized before the cache so load_model(), load_model(False) and
+# load_model(quantized=False) share one copy of the model.
+def load_model(quantized=USE_QUANTIZED_MODEL):
+    return _load_model(bool(quantized))
+
+
+@functools.lru_cache(maxsize=None)
+def _load_model(quantized):
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+    if not quantized:
+        model = AutoModel.from_pretrained(MODEL_ID)
+    elif os.path.exists(QUANTIZED_MODEL_PATH):
+        model = torch.load(QUANTIZED_MODEL_PATH, weights_only=False)
+    else:
+        model = quantize_model(AutoModel.from_pretrained(MODEL_ID))
+        torch.save(model, QUANTIZED_MODEL_PATH)
+    model.eval()
+    return tokenizer, model
+
+
+# Embed names in mini-batches of similar token length so each batch is padded only to its own
+# longest name, then put the embeddings back in the original order
+def embed_with_model(names, batch_size=EMBEDDING_BATCH_SIZE, quantized=USE_QUANTIZED_MODEL):
+    tokenizer, model = load_model(quantized)
+    names = list(names)
+    lengths = [len(ids) for ids in tokenizer(names, truncation=True)['input_ids']]
+    order = np.argsort(lengths, kind='stable')
+    embeddings = np.empty((len(names), model.config.hidden_size), dtype=np.float32)
+    tokens = padded_tokens = 0
+    start = time.perf_counter()
+    for batch_start in range(0, len(order), batch_size):
+        batch = order[batch_start:batch_start + batch_size]
+        encoded_input = tokenizer([names[i] for i in batch], padding=True, truncation=True, return_tensors='pt')
+        with torch.no_grad():
+            model_output = model(**encoded_input)
+        # Mean over real tokens only, so the result does not depend on how much padding the batch got
+        mask = encoded_input['attention_mask'].unsqueeze(-1).to(model_output.last_hidden_state.dtype)
+        pooled = (model_output.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        embeddings[batch] = pooled.numpy()
+        tokens += int(encoded_input['attention_mask'].sum())
+        padded_tokens += encoded_input['attention_mask'].numel()
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    if names:
+        print(f"Embedded {len(names)} names in {elapsed:.2f}s: {len(names) / elapsed:.1f} names/s, "
+              f"{tokens / elapsed:.1f} tokens/s, {tokens / padded_tokens:.1%} of batch slots were real tokens")
     return embeddings
 
-# Compute embeddings for male and female names
-male_embeddings = compute_embeddings(male_names)
-female_embeddings = compute_embeddings(female_names)
-
-# Compute the similarity matrix
-similarity_matrix = cosine_similarity(male_embeddings, female_embeddings)
-
-# Prepare the results dictionary
-results = []
-
-# Filter and collect similar names
-for i, male_name in enumerate(male_names):
-    for j, female_name in enumerate(female_names):
-        similarity = similarity_matrix[i][j]
-        if similarity >= 0.5:  # 50% similarity threshold
-            results.append({
-                "male_name": male_name,
-                "female_name": female_name,
-                "similarity": float(similarity)
-            })
-
-# Save results to a JSON file
-output_path = "E:/Downloads/similar_names.json"
-with open(output_path, 'w') as json_file:
-    json.dump(results, json_file, indent=4)
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_ID)
+
+
+def compute_embeddings(names):
+    return embedding_cache.get_many(names, embed_with_model)
+
+
+# Compute the similarity matrix tile by tile and yield (male indices, female indices, scores)
+# for every pair at or above the threshold, so the full matrix is never held in memory
+def iter_similar_pairs(male_embeddings, female_embeddings, threshold=SIMILARITY_THRESHOLD, block_size=BLOCK_SIZE):
+    return iter_unit_pairs(normalize_embeddings(male_embeddings), normalize_embeddings(female_embeddings),
+                           threshold, block_size)
+
+
+# Two-stage cascade: character n-grams propose candidate pairs, then only the names that appear in
+# a candidate are embedded and only the candidate pairs are scored with the embeddings. The lexical
+# stage runs twice, once to find the names to embed and once to score its blocks as they come, so
+# only one block of candidates is ever held in memory.
+def cascade_similar_pairs(male_names, female_names, stats, threshold=SIMILARITY_THRESHOLD, chunk_size=BLOCK_SIZE * 4):
+    def candidate_blocks():
+        return lexical_candidate_pairs(male_names, female_names, LEXICAL_THRESHOLD, LEXICAL_NGRAM_RANGE)
+
+    male_used = np.zeros(len(male_names), dtype=bool)
+    female_used = np.zeros(len(female_names), dtype=bool)
+    stats["pairs"] = len(male_names) * len(female_names)
+    stats["candidates"] = 0
+    stats["matches"] = 0
+    for rows, cols, _ in candidate_blocks():
+        male_used[rows] = True
+        female_used[cols] = True
+        stats["candidates"] += len(rows)
+    stats["names_embedded"] = int(male_used.sum() + female_used.sum())
+    # Row of each used name in the embedding matrices below
+    male_position = np.cumsum(male_used) - 1
+    female_position = np.cumsum(female_used) - 1
+    male_unit = normalize_embeddings(compute_embeddings(male_names[male_used]))
+    female_unit = normalize_embeddings(compute_embeddings(female_names[female_used]))
+    for rows, cols, _ in candidate_blocks():
+        for start in range(0, len(rows), chunk_size):
+            block_rows, block_cols = rows[start:start + chunk_size], cols[start:start + chunk_size]
+            scores = np.einsum('ij,ij->i', male_unit[male_position[block_rows]], female_unit[female_position[block_cols]])
+            keep = scores >= threshold
+            stats["matches"] += int(keep.sum())
+            if keep.any():
+                yield block_rows[keep], block_cols[keep], scores[keep]
+
+
+def print_cascade_report(stats, name_count):
+    print(f"Lexical stage: {stats['pairs']} pairs -> {stats['candidates']} candidates "
+          f"({stats['pairs'] - stats['candidates']} removed)")
+    print(f"Embedding stage: {stats['candidates']} candidates -> {stats['matches']} matches "
+          f"({stats['candidates'] - stats['matches']} removed), "
+          f"{stats['names_embedded']} of {name_count} names embedded")
+
+
+# Identifies one written JSON Lines output through its manifest, so a saved state is only trusted
+# for the exact file it was saved with
+def output_fingerprint(manifest):
+    return {"created_at": manifest["created_at"], "matches": manifest["matches"],
+            "bytes": manifest["files"]["jsonl"]["bytes"]}
+
+
+# Previous run's name sets, if they were scored exactly with the same threshold and embeddings and
+# OUTPUT_PATH still holds that run's results. The JSON Lines output is moved into the state
+# directory so this run can read it while writing anew.
+def load_previous_run():
+    state_path = os.path.join(INCREMENTAL_STATE_DIR, "state.json")
+    results_path = os.path.join(INCREMENTAL_STATE_DIR, "previous_results.jsonl")
+    if "jsonl" not in OUTPUT_FORMATS or not os.path.exists(state_path):
+        return None
+    with open(state_path) as state_file:
+        state = json.load(state_file)
+    if state["threshold"] != SIMILARITY_THRESHOLD or state["embeddings"] != EMBEDDING_CACHE_ID:
+        return None
+    # A leftover previous_results.jsonl of the right size means the last incremental run was
+    # interrupted before finishing its output, so reuse it
+    if os.path.exists(results_path) and os.path.getsize(results_path) == state["output"]["bytes"]:
+        state["results_path"] = results_path
+        return state
+    manifest_path = OUTPUT_PATH + ".manifest.json"
+    if not os.path.exists(manifest_path) or not os.path.exists(OUTPUT_PATH + ".jsonl"):
+        return None
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+    if ("jsonl" not in manifest.get("files", {}) or output_fingerprint(manifest) != state["output"]
+            or os.path.getsize(OUTPUT_PATH + ".jsonl") != state["output"]["bytes"]):
+        return None
+    os.replace(OUTPUT_PATH + ".jsonl", results_path)
+    state["results_path"] = results_path
+    return state
+
+
+def save_run_state(male_names, female_names, manifest):
+    os.makedirs(INCREMENTAL_STATE_DIR, exist_ok=True)
+    state_path = os.path.join(INCREMENTAL_STATE_DIR, "state.json")
+    with open(state_path + ".tmp", "w") as state_file:
+        json.dump({
+            "threshold": SIMILARITY_THRESHOLD,
+            "embeddings": EMBEDDING_CACHE_ID,
+            "output": output_fingerprint(manifest),
+            "male_names": male_names.tolist(),
+            "female_names": female_names.tolist(),
+        }, state_file)
+    os.replace(state_path + ".tmp", state_path)
+
+
+# Forget the saved state, for runs whose output is not a sound base for an incremental run
+def clear_run_state():
+    state_path = os.path.join(INCREMENTAL_STATE_DIR, "state.json")
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+
+# Carry over previous matches whose names are both still on the roster, then score only the
+# new male names against every female name and the remaining male names against the new female names
+def incremental_similar_pairs(male_names, female_names, previous, stats, chunk_size=BLOCK_SIZE * 16):
+    male_index = {name: i for i, name in enumerate(male_names)}
+    female_index = {name: i for i, name in enumerate(female_names)}
+    old_male = set(previous["male_names"])
+    old_female = set(previous["female_names"])
+    new_male_rows = np.array([i for i, name in enumerate(male_names) if name not in old_male], dtype=np.int64)
+    old_male_rows = np.array([i for i, name in enumerate(male_names) if name in old_male], dtype=np.int64)
+    new_female_cols = np.array([j for j, name in enumerate(female_names) if name not in old_female], dtype=np.int64)
+    stats.update({
+        "male_added": len(new_male_rows),
+        "male_removed": len(old_male) - len(old_male_rows),
+        "female_added": len(new_female_cols),
+        "female_removed": len(old_female) - (len(female_names) - len(new_female_cols)),
+        "carried_matches": 0,
+        "dropped_matches": 0,
+        "new_matches": 0,
+        "pairs_scored": len(new_male_rows) * len(female_names) + len(old_male_rows) * len(new_female_cols),
+    })
+
+    with open(previous["results_path"], encoding="utf-8") as results_file:
+        while True:
+            lines = [line for _, line in zip(range(chunk_size), results_file)]
+            if not lines:
+                break
+            rows, cols, scores = [], [], []
+            for line in lines:
+                match = json.loads(line)
+                if match["male_name"] in male_index and match["female_name"] in female_index:
+                    rows.append(male_index[match["male_name"]])
+                    cols.append(female_index[match["female_name"]])
+                    scores.append(match["similarity"])
+            stats["carried_matches"] += len(rows)
+            stats["dropped_matches"] += len(lines) - len(rows)
+            if rows:
+                yield np.array(rows), np.array(cols), np.array(scores, dtype=np.float32)
+
+    for male_rows, female_cols in ((new_male_rows, np.arange(len(female_names))), (old_male_rows, new_female_cols)):
+        if not len(male_rows) or not len(female_cols):
+            continue
+        male_embeddings = compute_embeddings(male_names[male_rows])
+        female_embeddings = compute_embeddings(female_names[female_cols])
+        for rows, cols, scores in iter_similar_pairs(male_embeddings, female_embeddings):
+            stats["new_matches"] += len(rows)
+            yield male_rows[rows], female_cols[cols], scores
+
+
+def print_incremental_report(stats):
+    print(f"Roster changes: +{stats['male_added']}/-{stats['male_removed']} male names, "
+          f"+{stats['female_added']}/-{stats['female_removed']} female names")
+    print(f"Incremental run: {stats['carried_matches']} matches carried over, {stats['dropped_matches']} dropped, "
+          f"{stats['new_matches']} new from {stats['pairs_scored']} pairs scored")
+
+
+# Reuse the saved index over the female embeddings unless they changed since it was built
+def load_or_build_ann_index(female_embeddings):
+    if os.path.exists(ANN_INDEX_PATH):
+        index = IVFIndex.load(ANN_INDEX_PATH)
+        if index.digest == vectors_digest(female_embeddings):
+            return index
+    index = IVFIndex.build(female_embeddings)
+    index.save(ANN_INDEX_PATH)
+    return index
+
+
+def print_recall_report(index, male_embeddings, female_embeddings):
+    exact_search = lambda queries: iter_similar_pairs(queries, female_embeddings)
+    report = recall_report(index, male_embeddings, exact_search, SIMILARITY_THRESHOLD,
+                           top_k=ANN_TOP_K, sample_size=ANN_RECALL_SAMPLE)
+    print("n_probe  recall  exact pairs  ann pairs  exact s   ann s  speedup")
+    for row in report:
+        print("{n_probe:7d}  {recall:6.3f}  {exact_pairs:11d}  {ann_pairs:9d}  {exact_seconds:7.3f}"
+              "  {ann_seconds:6.3f}  {speedup:6.1f}x".format(**row))
+
+
+# Distinct first names of one gender as an object array, the first word of 'Other Names'
+def first_names(df, gender):
+    names = df[df['Gender'] == gender]['Other Names'].str.split().str[0].dropna().unique()
+    return np.asarray(names, dtype=object)
+
+
+if __name__ == "__main__":
+    df = add_email_columns(read_roster(ROSTER_PATH))
+    female_names = first_names(df, 'F')
+    male_names = first_names(df, 'M')
+
+    # Filter similar names and stream the results to the output files. Only exact results are a
+    # sound base for the next incremental run; any other run invalidates the saved state before it
+    # overwrites the output.
+    run_info = {"threshold": SIMILARITY_THRESHOLD, "embeddings": EMBEDDING_CACHE_ID}
+    previous_run = load_previous_run() if USE_INCREMENTAL else None
+    keep_state = USE_INCREMENTAL and "jsonl" in OUTPUT_FORMATS and (
+        previous_run is not None or not (USE_ANN_INDEX or USE_LEXICAL_PREFILTER))
+    if not keep_state:
+        clear_run_state()
+    if previous_run is not None:
+        incremental_stats = {}
+        manifest = write_result_files(incremental_similar_pairs(male_names, female_names, previous_run, incremental_stats),
+                                      male_names, female_names, OUTPUT_PATH, OUTPUT_FORMATS, mode="incremental", **run_info)
+        print_incremental_report(incremental_stats)
+    elif USE_LEXICAL_PREFILTER:
+        cascade_stats = {}
+        manifest = write_result_files(cascade_similar_pairs(male_names, female_names, cascade_stats), male_names,
+                                      female_names, OUTPUT_PATH, OUTPUT_FORMATS, mode="lexical-prefilter", **run_info)
+        print_cascade_report(cascade_stats, len(male_names) + len(female_names))
+    else:
+        # Compute embeddings for male and female names
+        male_embeddings = compute_embeddings(male_names)
+        female_embeddings = compute_embeddings(female_names)
+        if USE_ANN_INDEX:
+            ann_index = load_or_build_ann_index(female_embeddings)
+            print_recall_report(ann_index, male_embeddings, female_embeddings)
+            pairs = ann_index.search(male_embeddings, SIMILARITY_THRESHOLD, top_k=ANN_TOP_K, n_probe=ANN_N_PROBE)
+        elif USE_SHARDED_SCORING:
+            pairs = iter_sharded_pairs(male_embeddings, female_embeddings, SIMILARITY_THRESHOLD, BLOCK_SIZE,
+                                       SHARD_WORKERS, THREADS_PER_WORKER)
+        else:
+            pairs = iter_similar_pairs(male_embeddings, female_embeddings)
+        manifest = write_result_files(pairs, male_names, female_names, OUTPUT_PATH, OUTPUT_FORMATS,
+                                      mode="ann" if USE_ANN_INDEX else "exact", **run_info)
+    # Save the new state before dropping the previous results it replaces
+    if keep_state:
+        save_run_state(male_names, female_names, manifest)
+    if previous_run is not None:
+        os.remove(previous_run["results_path"])
+    print("Embedding cache: {hits} hits, {misses} misses ({hit_rate:.1%} hit rate, {entries} entries)".format(**embedding_cache.stats()))
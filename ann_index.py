@@ -0,0 +1,134 @@
+import hashlib
+import time
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from tiled_similarity import normalize_embeddings
+
+QUERY_BLOCK_SIZE = 2048  # queries scored per step
+TRAINING_POINTS_PER_LIST = 256  # k-means is trained on at most this many points per list
+
+
+# Fingerprint of the indexed vectors, used to tell whether a saved index is stale
+def vectors_digest(vectors):
+    return hashlib.sha1(np.ascontiguousarray(normalize_embeddings(vectors)).tobytes()).hexdigest()
+
+
+# Keep only the top_k best scores of every query row
+def _top_k_per_row(rows, cols, scores, top_k):
+    order = np.lexsort((-scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = rank < top_k
+    return rows[keep], cols[keep], scores[keep]
+
+
+class IVFIndex:
+    # Inverted-file index for cosine similarity: vectors are clustered with spherical k-means and
+    # stored grouped by cluster, and a query only scores the vectors of its n_probe closest clusters.
+
+    def __init__(self, centroids, vectors, ids, offsets, digest=""):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.offsets = offsets
+        self.digest = digest
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, seed=0):
+        unit = normalize_embeddings(vectors)
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(len(unit)))
+        n_lists = max(1, min(n_lists, len(unit)))
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(unit), n_lists * TRAINING_POINTS_PER_LIST)
+        training = unit[rng.choice(len(unit), sample_size, replace=False)]
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=seed, n_init=3).fit(training)
+        centroids = normalize_embeddings(kmeans.cluster_centers_)
+        assignments = np.concatenate([
+            np.argmax(unit[start:start + QUERY_BLOCK_SIZE] @ centroids.T, axis=1)
+            for start in range(0, len(unit), QUERY_BLOCK_SIZE)
+        ]) if len(unit) else np.empty(0, dtype=np.int64)
+        ids = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[ids], np.arange(n_lists + 1))
+        return cls(centroids, unit[ids], ids, offsets, vectors_digest(unit))
+
+    def save(self, path):
+        with open(path, "wb") as index_file:
+            np.savez(index_file, centroids=self.centroids, vectors=self.vectors, ids=self.ids,
+                     offsets=self.offsets, digest=np.array(self.digest))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["centroids"], data["vectors"], data["ids"], data["offsets"], str(data["digest"]))
+
+    # Yield (query indices, vector ids, scores) per block of queries for every neighbour at or
+    # above threshold, optionally limited to the top_k best neighbours of each query
+    def search(self, queries, threshold, top_k=None, n_probe=8, block_size=QUERY_BLOCK_SIZE):
+        queries = normalize_embeddings(queries)
+        n_lists = len(self.centroids)
+        n_probe = max(1, min(n_probe, n_lists))
+        for start in range(0, len(queries), block_size):
+            block = queries[start:start + block_size]
+            coarse = block @ self.centroids.T
+            probes = np.argpartition(-coarse, n_probe - 1, axis=1)[:, :n_probe].ravel()
+            # Group the (query, list) probes by list so every list is scored with one matrix product
+            by_list = np.argsort(probes, kind="stable")
+            probed_queries = np.repeat(np.arange(len(block)), n_probe)[by_list]
+            bounds = np.searchsorted(probes[by_list], np.arange(n_lists + 1))
+            rows, cols, scores = [], [], []
+            for list_id in np.flatnonzero(np.diff(bounds)):
+                low, high = self.offsets[list_id], self.offsets[list_id + 1]
+                if low == high:
+                    continue
+                members = probed_queries[bounds[list_id]:bounds[list_id + 1]]
+                tile = block[members] @ self.vectors[low:high].T
+                hit_rows, hit_cols = np.nonzero(tile >= threshold)
+                rows.append(members[hit_rows])
+                cols.append(self.ids[low + hit_cols])
+                scores.append(tile[hit_rows, hit_cols])
+            if not rows:
+                continue
+            rows, cols, scores = np.concatenate(rows), np.concatenate(cols), np.concatenate(scores)
+            if top_k is not None:
+                rows, cols, scores = _top_k_per_row(rows, cols, scores, top_k)
+            if len(rows):
+                yield rows + start, cols, scores
+
+
+def _pair_set(blocks):
+    return {(int(row), int(col)) for rows, cols, _ in blocks for row, col in zip(rows, cols)}
+
+
+# Compare the index against exact search on a random sample of queries for several n_probe values.
+# exact_search(queries) must yield the same (rows, cols, scores) blocks as IVFIndex.search.
+def recall_report(index, queries, exact_search, threshold, top_k=None, n_probes=(1, 2, 4, 8, 16, 32),
+                  sample_size=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(queries)[rng.choice(len(queries), min(sample_size, len(queries)), replace=False)]
+    start = time.perf_counter()
+    exact_blocks = list(exact_search(sample))
+    exact_seconds = time.perf_counter() - start
+    if top_k is not None and exact_blocks:
+        exact_blocks = [_top_k_per_row(*map(np.concatenate, zip(*exact_blocks)), top_k)]
+    expected = _pair_set(exact_blocks)
+    report = []
+    for n_probe in sorted(set(min(n_probe, len(index.centroids)) for n_probe in n_probes)):
+        start = time.perf_counter()
+        found = _pair_set(index.search(sample, threshold, top_k=top_k, n_probe=n_probe))
+        ann_seconds = time.perf_counter() - start
+        report.append({
+            "n_probe": n_probe,
+            "recall": len(found & expected) / len(expected) if expected else 1.0,
+            "exact_pairs": len(expected),
+            "ann_pairs": len(found),
+            "exact_seconds": exact_seconds,
+            "ann_seconds": ann_seconds,
+            "speedup": exact_seconds / ann_seconds if ann_seconds else float("inf"),
+        })
+    return report
@@ -0,0 +1,149 @@
+import argparse
+import collections
+import concurrent.futures
+import importlib.util
+import json
+import os
+import time
+
+import cairo
+
+from drawing import house_scene
+from scene_graph import render_scene
+from tiled_render import encode_png, surface_pixels
+
+SPHERE_MODULE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Drawing 2", "drawing_sphere.py")
+ENCODE_WORKERS = os.cpu_count()
+MAX_PENDING_ENCODES = 64  # drawn images waiting for the encoder pool, bounds memory
+
+
+# "Drawing 2" is not an importable package name, so load the sphere module from its file
+def _load_sphere_module():
+    spec = importlib.util.spec_from_file_location("drawing_sphere", SPHERE_MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+drawing_sphere = _load_sphere_module()
+
+
+def draw_house(ctx, width, height, params):
+    scene = house_scene(**{key: tuple(value) for key, value in params.items()})
+    ctx.scale(width / scene.width, height / scene.height)
+    render_scene(ctx, scene)
+
+
+def draw_sphere(ctx, width, height, params):
+    ctx.set_source_rgb(*params.get("background", (0.2, 0.2, 0.2)))
+    ctx.paint()
+    texture = params.get("texture", os.path.join(os.path.dirname(SPHERE_MODULE_PATH), "earth-1617121_1280.png"))
+    drawing_sphere.draw_sphere(ctx, params.get("center_x", width // 2), params.get("center_y", height // 2),
+                               params.get("radius", min(width, height) // 2), texture)
+
+
+# Drawing name -> (draw function, surface format, default size)
+DRAWINGS = {
+    "house": (draw_house, cairo.FORMAT_RGB24, (900, 800)),
+    "sphere": (draw_sphere, cairo.FORMAT_ARGB32, (drawing_sphere.WIDTH, drawing_sphere.HEIGHT)),
+}
+
+
+class SurfacePool:
+    # Preallocated image surfaces, one free list per (format, width, height)
+
+    def __init__(self):
+        self._free = collections.defaultdict(list)
+        self.created = 0
+
+    def acquire(self, surface_format, width, height):
+        free = self._free[surface_format, width, height]
+        if free:
+            surface = free.pop()
+        else:
+            surface = cairo.ImageSurface(surface_format, width, height)
+            self.created += 1
+        ctx = cairo.Context(surface)
+        ctx.set_operator(cairo.OPERATOR_CLEAR)
+        ctx.paint()
+        return surface
+
+    def release(self, surface):
+        self._free[surface.get_format(), surface.get_width(), surface.get_height()].append(surface)
+
+
+def encode_and_write(pixels, path):
+    start = time.perf_counter()
+    data = encode_png(pixels)
+    encoded = time.perf_counter()
+    with open(path, "wb") as output_file:
+        output_file.write(data)
+    return encoded - start, time.perf_counter() - encoded
+
+
+# Draw every job on a pooled surface in this thread, copy its pixels out so the surface can be
+# reused straight away, and hand PNG encoding and writing to a thread pool (zlib releases the GIL)
+def run_jobs(jobs, workers=ENCODE_WORKERS):
+    surfaces = SurfacePool()
+    stats = {"jobs": 0, "failed": 0, "draw": 0.0, "encode": 0.0, "write": 0.0}
+    start = time.perf_counter()
+
+    def collect(future, job):
+        try:
+            encode_seconds, write_seconds = future.result()
+            stats["encode"] += encode_seconds
+            stats["write"] += write_seconds
+            stats["jobs"] += 1
+        except OSError as error:
+            stats["failed"] += 1
+            print(f"FAILED {job.get('output')}: {error}")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        for job in jobs:
+            try:
+                draw, surface_format, (default_width, default_height) = DRAWINGS[job["drawing"]]
+                width, height = job.get("width", default_width), job.get("height", default_height)
+                draw_start = time.perf_counter()
+                surface = surfaces.acquire(surface_format, width, height)
+                try:
+                    draw(cairo.Context(surface), width, height, job.get("params", {}))
+                    pixels = surface_pixels(surface)
+                finally:
+                    surfaces.release(surface)
+                stats["draw"] += time.perf_counter() - draw_start
+            except (KeyError, TypeError, ValueError, cairo.Error) as error:
+                stats["failed"] += 1
+                print(f"FAILED {job.get('output')}: {type(error).__name__}: {error}")
+                continue
+            pending.append((pool.submit(encode_and_write, pixels, job["output"]), job))
+            if len(pending) >= MAX_PENDING_ENCODES:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["surfaces"] = surfaces.created
+    return stats
+
+
+def read_jobs(path):
+    with open(path) as jobs_file:
+        for line in jobs_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a JSONL file of drawing jobs to PNG files")
+    parser.add_argument("jobs", help='JSONL file, one job per line: {"drawing": "house", "output": "a.png", '
+                                     '"width": 900, "height": 800, "params": {"moon_colour": [1, 0, 0]}}')
+    parser.add_argument("--workers", type=int, default=ENCODE_WORKERS, help="PNG encoder threads")
+    args = parser.parse_args()
+
+    stats = run_jobs(read_jobs(args.jobs), args.workers)
+    done = max(stats["jobs"], 1)
+    print(f"{stats['jobs']} jobs ({stats['failed']} failed) in {stats['seconds']:.2f}s: "
+          f"{stats['jobs'] / stats['seconds']:.1f} jobs/s using {stats['surfaces']} surfaces")
+    for stage in ("draw", "encode", "write"):
+        print(f"{stage:>7}: {stats[stage]:8.3f}s total, {stats[stage] / done * 1000:8.2f} ms per job")
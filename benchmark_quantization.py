@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+
+from Similarity import SIMILARITY_THRESHOLD, embed_with_model, load_model, normalize_embeddings
+
+# Fixed name set so every benchmark run compares the same inputs
+NAMES = [
+    "Aisha", "Akinyi", "Alice", "Amani", "Amina", "Andrew", "Anne", "Baraka", "Brian", "Catherine",
+    "Charles", "Chebet", "Daniel", "David", "Dennis", "Esther", "Faith", "Fatuma", "Grace", "Hassan",
+    "Ian", "Irene", "Jabari", "James", "Jane", "Jeremiah", "John", "Joseph", "Joy", "Juma",
+    "Kamau", "Kevin", "Kiprono", "Lilian", "Linet", "Margaret", "Mary", "Mercy", "Michael", "Mohamed",
+    "Mwangi", "Naliaka", "Nekesa", "Njeri", "Otieno", "Peter", "Purity", "Rose", "Ruth", "Samuel",
+    "Sarah", "Stephen", "Susan", "Wanjiru", "Wekesa", "Zawadi", "Zuberi", "Émilie", "José", "Zoë",
+]
+REPEATS = 20  # the name set is repeated to get stable throughput numbers
+
+
+def run(names, quantized):
+    load_model(quantized)  # keep model loading and conversion out of the timing
+    start = time.perf_counter()
+    embeddings = embed_with_model(names, quantized=quantized)
+    return embeddings, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    names = NAMES * REPEATS
+    fp32, fp32_seconds = run(names, quantized=False)
+    int8, int8_seconds = run(names, quantized=True)
+
+    fp32_unit = normalize_embeddings(fp32[:len(NAMES)])
+    int8_unit = normalize_embeddings(int8[:len(NAMES)])
+    self_similarity = np.einsum('ij,ij->i', fp32_unit, int8_unit)
+    fp32_matrix = fp32_unit @ fp32_unit.T
+    int8_matrix = int8_unit @ int8_unit.T
+    agreement = np.mean((fp32_matrix >= SIMILARITY_THRESHOLD) == (int8_matrix >= SIMILARITY_THRESHOLD))
+
+    print(f"fp32: {len(names) / fp32_seconds:8.1f} names/s")
+    print(f"int8: {len(names) / int8_seconds:8.1f} names/s ({fp32_seconds / int8_seconds:.2f}x)")
+    print(f"fp32 vs int8 embedding cosine: mean {self_similarity.mean():.4f}, min {self_similarity.min():.4f}")
+    print(f"Similarity drift: mean {np.abs(fp32_matrix - int8_matrix).mean():.4f}, "
+          f"max {np.abs(fp32_matrix - int8_matrix).max():.4f}")
+    print(f"Pairs on the same side of the {SIMILARITY_THRESHOLD} threshold: {agreement:.2%}")
@@ -0,0 +1,217 @@
+import collections
+import heapq
+import time
+from array import array
+
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+except ImportError:  # without scipy the full field is built by a pure Python breadth-first search
+    dijkstra = None
+
+UNREACHABLE = -1
+REPAIR_LIMIT = 50000  # tiles an incremental repair may touch before a full rebuild is cheaper
+
+
+# Breadth-first search over a flat tile index, in Python
+def _breadth_first(walls, goal):
+    height, width = walls.shape
+    is_open = (~walls).ravel().tobytes()
+    distances = array("i", [UNREACHABLE]) * (height * width)
+    start = goal[0] * width + goal[1]
+    distances[start] = 0
+    queue = collections.deque([start])
+    while queue:
+        tile = queue.popleft()
+        step = distances[tile] + 1
+        column = tile % width
+        for neighbour in (tile - width, tile + width,
+                          tile - 1 if column > 0 else -1, tile + 1 if column < width - 1 else -1):
+            if 0 <= neighbour < len(distances) and is_open[neighbour] and distances[neighbour] == UNREACHABLE:
+                distances[neighbour] = step
+                queue.append(neighbour)
+    return np.frombuffer(distances, dtype=np.int32).reshape(height, width).copy()
+
+
+# Unit-weight shortest paths over the open tiles only, computed by scipy in C
+def _sparse_breadth_first(walls, goal):
+    height, width = walls.shape
+    is_open = ~walls.ravel()
+    tiles = np.flatnonzero(is_open)
+    node = np.full(height * width, -1, dtype=np.int64)
+    node[tiles] = np.arange(len(tiles))
+    right = tiles[(tiles % width < width - 1) & is_open[np.minimum(tiles + 1, height * width - 1)]]
+    down = tiles[(tiles < (height - 1) * width) & is_open[np.minimum(tiles + width, height * width - 1)]]
+    sources = node[np.concatenate([right, down])]
+    targets = node[np.concatenate([right + 1, down + width])]
+    graph = csr_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(len(tiles), len(tiles)))
+    reached = dijkstra(graph, directed=False, indices=node[goal[0] * width + goal[1]], unweighted=True)
+    distances = np.full(height * width, UNREACHABLE, dtype=np.int32)
+    finite = np.isfinite(reached)
+    distances[tiles[finite]] = reached[finite].astype(np.int32)
+    return distances.reshape(height, width)
+
+
+# Number of steps from every tile to the goal tile, int32, UNREACHABLE for walls and cut-off tiles
+def compute_distances(walls, goal):
+    if walls[goal]:
+        raise ValueError(f"goal {goal} is a wall")
+    if dijkstra is None:
+        return _breadth_first(walls, goal)
+    return _sparse_breadth_first(walls, goal)
+
+
+class DistanceField:
+    # Distances to a goal over a wall grid. The best move from any tile is one lookup, and changing
+    # a wall only repairs the distances that the change can affect. The wall grid is shared with the
+    # caller and edited in place by set_wall.
+
+    def __init__(self, walls, goal):
+        self.walls = walls
+        self.goal = tuple(goal)
+        self.distances = compute_distances(walls, self.goal)
+
+    def _neighbours(self, tile):
+        y, x = tile
+        height, width = self.walls.shape
+        if y > 0:
+            yield y - 1, x
+        if y < height - 1:
+            yield y + 1, x
+        if x > 0:
+            yield y, x - 1
+        if x < width - 1:
+            yield y, x + 1
+
+    # The neighbouring tile one step closer to the goal, or None at the goal or when cut off
+    def next_step(self, tile):
+        distance = self.distances[tile]
+        if distance <= 0:
+            return None
+        for neighbour in self._neighbours(tile):
+            if self.distances[neighbour] == distance - 1:
+                return neighbour
+        return None
+
+    # Tiles from the given one towards the goal, at most limit of them
+    def route(self, tile, limit=None):
+        tiles = []
+        tile = self.next_step(tile)
+        while tile is not None and (limit is None or len(tiles) < limit):
+            tiles.append(tile)
+            tile = self.next_step(tile)
+        return tiles
+
+    # Make a tile a wall or open it, and repair the field. Returns how many tiles were recomputed.
+    def set_wall(self, tile, wall):
+        tile = tuple(tile)
+        if bool(self.walls[tile]) == wall:
+            return 0
+        if wall and tile == self.goal:
+            raise ValueError("cannot wall in the goal")
+        self.walls[tile] = wall
+        if wall:
+            return self._close(tile)
+        return self._open(tile)
+
+    def _rebuild(self):
+        self.distances = compute_distances(self.walls, self.goal)
+        return self.distances.size
+
+    # A new opening can only shorten routes: relax outwards from it in breadth-first order
+    def _open(self, tile):
+        distances = self.distances
+        reachable = [distances[neighbour] for neighbour in self._neighbours(tile) if distances[neighbour] >= 0]
+        if not reachable:
+            return 0
+        distances[tile] = min(reachable) + 1
+        changed = 1
+        queue = collections.deque([tile])
+        while queue:
+            current = queue.popleft()
+            step = distances[current] + 1
+            for neighbour in self._neighbours(current):
+                if not self.walls[neighbour] and (distances[neighbour] < 0 or distances[neighbour] > step):
+                    distances[neighbour] = step
+                    changed += 1
+                    queue.append(neighbour)
+            if changed > REPAIR_LIMIT:
+                return self._rebuild()
+        return changed
+
+    # A new wall can only lengthen routes through it. Find, level by level, the tiles that have lost
+    # every neighbour one step closer to the goal, then re-run a shortest-path search over just those
+    # tiles, seeded from the unaffected tiles around them. Cutting off a large part of the maze falls
+    # back to rebuilding the whole field.
+    def _close(self, tile):
+        distances = self.distances
+        distance = int(distances[tile])
+        distances[tile] = UNREACHABLE
+        if distance < 0:
+            return 0
+        affected = set()
+        candidates = collections.deque(neighbour for neighbour in self._neighbours(tile)
+                                       if distances[neighbour] == distance + 1)
+        while candidates:
+            current = candidates.popleft()
+            if current in affected:
+                continue
+            level = distances[current]
+            if any(distances[neighbour] == level - 1 and neighbour not in affected
+                   for neighbour in self._neighbours(current)):
+                continue
+            affected.add(current)
+            if len(affected) > REPAIR_LIMIT:
+                return self._rebuild()
+            candidates.extend(neighbour for neighbour in self._neighbours(current)
+                              if distances[neighbour] == level + 1)
+
+        for current in affected:
+            distances[current] = UNREACHABLE
+        heap = []
+        for current in affected:
+            reachable = [distances[neighbour] for neighbour in self._neighbours(current)
+                         if neighbour not in affected and distances[neighbour] >= 0]
+            if reachable:
+                heap.append((int(min(reachable)) + 1, current))
+        heapq.heapify(heap)
+        while heap:
+            step, current = heapq.heappop(heap)
+            if distances[current] >= 0:
+                continue
+            distances[current] = step
+            for neighbour in self._neighbours(current):
+                if neighbour in affected and distances[neighbour] < 0:
+                    heapq.heappush(heap, (step + 1, neighbour))
+        return len(affected) + 1
+
+
+if __name__ == "__main__":
+    import maze_generator
+
+    for size in (100, 250, 500, 1000, 2000):
+        walls = maze_generator.generate_maze(size, size, seed=0).copy()
+        goal = (walls.shape[0] - 2, walls.shape[1] - 2)
+        start = time.perf_counter()
+        field = DistanceField(walls, goal)
+        built = time.perf_counter() - start
+
+        start = time.perf_counter()
+        route = field.route((1, 1))
+        walked = time.perf_counter() - start
+
+        # Close and reopen a passage halfway along the route
+        passage = route[len(route) // 2]
+        if passage[0] % 2 == 1 and passage[1] % 2 == 1:
+            passage = route[len(route) // 2 + 1]
+        start = time.perf_counter()
+        closed = field.set_wall(passage, True)
+        opened = field.set_wall(passage, False)
+        repaired = time.perf_counter() - start
+        assert (field.distances == compute_distances(walls, goal)).all()
+
+        print(f"{size}x{size}: field {built:.3f}s, route of {len(route)} tiles {walked * 1000:.1f} ms "
+              f"({walked / len(route) * 1e6:.2f} us/step), wall toggle {repaired * 1000:.1f} ms "
+              f"recomputing {closed + opened} tiles")
@@ -1,86 +1,66 @@
-import cairo
 import math
 
-#surface - white
-surface = cairo.ImageSurface(cairo.FORMAT_RGB24, 900, 800)
-ctx = cairo.Context(surface)
-ctx.set_source_rgb(1, 1, 1)
-ctx.paint()
+from scene_graph import Node, Scene, SceneRenderer, Style
 
-#outline of house
-ctx.move_to(100,400)
-ctx.line_to(100, 470)
-ctx.line_to(140, 470)
-ctx.line_to(140, 780)
-ctx.line_to(620, 780)
-ctx.line_to(620, 470)
-ctx.line_to(660, 470)
-ctx.line_to(660, 400)
-ctx.close_path()
-ctx.set_line_width(3)
-ctx.set_source_rgb(0,0,0.5)
-ctx.stroke()
 
-#windows and door
-ctx.move_to(180, 550)
-ctx.line_to(180, 650)
-ctx.line_to(280, 650)
-ctx.line_to(280, 550)
-ctx.close_path()
-ctx.move_to(180, 600)
-ctx.line_to(280, 600)
-ctx.move_to(230, 550)
-ctx.line_to(230, 650)
+# The house described as data: every node is a path plus the style it is painted with
+def house_scene(outline_colour=(0, 0, 0.5), frame_colour=(0, 0.3, 0), moon_colour=(0.8, 0.8, 0)):
+    return Scene(900, 800, [
+        #outline of house
+        Node("outline", [
+            ("move_to", 100, 400),
+            ("line_to", 100, 470),
+            ("line_to", 140, 470),
+            ("line_to", 140, 780),
+            ("line_to", 620, 780),
+            ("line_to", 620, 470),
+            ("line_to", 660, 470),
+            ("line_to", 660, 400),
+            ("close_path",),
+        ], Style(stroke=outline_colour, line_width=3)),
 
-ctx.move_to(580, 550)
-ctx.line_to(580, 650)
-ctx.line_to(480, 650)
-ctx.line_to(480, 550)
-ctx.close_path()
-ctx.move_to(580, 600)
-ctx.line_to(480, 600)
-ctx.move_to(530, 550)
-ctx.line_to(530, 650)
+        #windows and door
+        Node("windows_and_door", [
+            ("move_to", 180, 550),
+            ("line_to", 180, 650),
+            ("line_to", 280, 650),
+            ("line_to", 280, 550),
+            ("close_path",),
+            ("move_to", 180, 600),
+            ("line_to", 280, 600),
+            ("move_to", 230, 550),
+            ("line_to", 230, 650),
 
-ctx.move_to(320, 780)
-ctx.line_to(320, 550)
-ctx.line_to(450, 550)
-ctx.line_to(450, 780)
+            ("move_to", 580, 550),
+            ("line_to", 580, 650),
+            ("line_to", 480, 650),
+            ("line_to", 480, 550),
+            ("close_path",),
+            ("move_to", 580, 600),
+            ("line_to", 480, 600),
+            ("move_to", 530, 550),
+            ("line_to", 530, 650),
 
-ctx.set_line_width(3)
-ctx.set_source_rgb(0,0.3,0)
-ctx.stroke()
+            ("move_to", 320, 780),
+            ("line_to", 320, 550),
+            ("line_to", 450, 550),
+            ("line_to", 450, 780),
+        ], Style(stroke=frame_colour, line_width=3)),
 
-#door knob
-ctx.arc(435, 670, 5, 0, 2*math.pi)
-ctx.set_source_rgb(0, 0, 1)
-ctx.set_line_width(7)
-ctx.stroke()
+        #door knob
+        Node("door_knob", [("arc", 435, 670, 5, 0, 2*math.pi)], Style(stroke=(0, 0, 1), line_width=7)),
 
-#dome of house
-ctx.arc(380, 400, 175, math.pi, 0)
-ctx.set_source_rgb(0, 0, 0.5)
-ctx.set_line_width(3)
-ctx.stroke()
+        #dome of house
+        Node("dome", [("arc", 380, 400, 175, math.pi, 0)], Style(stroke=outline_colour, line_width=3)),
 
-#moon
-#ctx.arc(585, 200, 40, (math.pi/4), ((5*math.pi)/4))
-#ctx.curve_to(590, 180, 590, 160, 570, 200)
-#ctx.set_source_rgb(1, 0.8, 0.2)
-#ctx.fill()
-#ctx.fill_preserve()
+        # Draw the crescent moon
+        Node("moon", [
+            ("arc_negative", 650, 150, 40, 5*math.pi/4, math.pi/4),
+            ("curve_to", 650, 175, 620, 170, 622, 120),
+        ], Style(fill=moon_colour, stroke=(0, 0, 1), line_width=1)),
+    ])
 
-# Draw the crescent moon
-ctx.set_line_width(1)
-ctx.arc_negative(650, 150, 40, 5*math.pi/4, math.pi/4)
-ctx.curve_to(650,175,620,170,622,120)
-ctx.set_source_rgb(0.8,0.8,0)
-ctx.fill_preserve()
-ctx.set_source_rgb(0,0,1)
-ctx.stroke()
 
-#ctx.arc(605, 180, 50, 0.45*math.pi, ((4.1*math.pi)/4))
-#ctx.set_source_rgb(1, 1, 1)
-#ctx.fill_preserve()
-
-surface.write_to_png('2Dhouse.png')
\ No newline at end of file
+if __name__ == "__main__":
+    surface = SceneRenderer(house_scene()).render()
+    surface.write_to_png('2Dhouse.png')
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import unicodedata
+
+import numpy as np
+from filelock import FileLock
+
+
+# Normalize a name the same way for every lookup so trivially different spellings share an entry
+def normalize_name(name):
+    return " ".join(unicodedata.normalize("NFC", str(name)).split())
+
+
+# Content-addressed key for one (model id, normalized name) pair
+def cache_key(model_id, name):
+    return hashlib.sha1(f"{model_id}\0{normalize_name(name)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    # On-disk embedding cache: a raw float32 matrix read through np.memmap plus a JSON index
+    # mapping each cache key to its row. New rows are only ever appended, so a rerun reuses
+    # everything that was embedded before and only sends unseen names through the model.
+    # Appends hold an inter-process file lock, so a daemon and batch runs can share one directory.
+
+    def __init__(self, cache_dir, model_id):
+        self.model_id = model_id
+        self.directory = os.path.join(cache_dir, hashlib.sha1(model_id.encode("utf-8")).hexdigest()[:16])
+        self.data_path = os.path.join(self.directory, "embeddings.f32")
+        self.index_path = os.path.join(self.directory, "index.json")
+        self.lock = FileLock(os.path.join(self.directory, "append.lock"))
+        self.hits = 0
+        self.misses = 0
+        self.dim = None
+        self.rows = {}
+        self._matrix = None
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def __len__(self):
+        return len(self.rows)
+
+    # Pick up rows that other processes have appended since this one last looked. The index is
+    # replaced atomically and only written after its rows, so it never names rows that are missing.
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as index_file:
+                index = json.load(index_file)
+            self.dim = index["dim"]
+            self.rows = index["rows"]
+            self._matrix = None
+
+    # Memory-mapped view of every row that the index knows about
+    def _view(self):
+        if self._matrix is None and self.rows:
+            self._matrix = np.memmap(self.data_path, dtype=np.float32, mode="r", shape=(len(self.rows), self.dim))
+        return self._matrix
+
+    # Under the file lock, reload the index, append the rows no other process has added meanwhile,
+    # then atomically rewrite the index
+    def _append(self, keys, embeddings):
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        with self.lock:
+            self._load_index()
+            new = [position for position, key in enumerate(keys) if key not in self.rows]
+            if not new:
+                return
+            if self.dim is None:
+                self.dim = embeddings.shape[1]
+            self._matrix = None
+            with open(self.data_path, "ab") as data_file:
+                # Drop any rows left behind by an interrupted run that never reached the index
+                data_file.truncate(len(self.rows) * self.dim * 4)
+                data_file.write(embeddings[new].tobytes())
+            for position in new:
+                self.rows[keys[position]] = len(self.rows)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w") as index_file:
+                json.dump({"model_id": self.model_id, "dim": self.dim, "rows": self.rows}, index_file)
+            os.replace(tmp_path, self.index_path)
+
+    # Return embeddings for names in order, calling compute(list_of_names) only for cache misses
+    def get_many(self, names, compute):
+        names = [str(name) for name in names]
+        keys = [cache_key(self.model_id, name) for name in names]
+        if any(key not in self.rows for key in keys):
+            self._load_index()
+        missing = {}
+        for key, name in zip(keys, names):
+            if key not in self.rows and key not in missing:
+                missing[key] = name
+        self.hits += len(names) - sum(key in missing for key in keys)
+        self.misses += sum(key in missing for key in keys)
+        if missing:
+            self._append(list(missing), np.asarray(compute(list(missing.values())), dtype=np.float32))
+        if not names:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.asarray(self._view()[[self.rows[key] for key in keys]])
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.rows),
+        }
@@ -21,34 +21,379 @@ df["Other names"]=(
     )
 df["Student_emails"]=df["Other Names"].str[0].str.lower() + df["Surname"].str.lower() + "@gmail.com"
 print(df)"""
+import argparse
+import concurrent.futures
+import glob
+import hashlib
+import itertools
+import json
+import os
+import time
+
+import openpyxl
 import pandas as pd
 
-file_path = r"C:\Users\mwend\OneDrive\Desktop\test_files.xlsx"
-df = pd.read_excel(file_path)
+from name_normalization import normalize_column
+from unique_emails import EmailAllocator
 
+# Constants
+INPUT_PATH = r"C:\Users\mwend\OneDrive\Desktop\test_files.xlsx"
+OUTPUT_PATH = "C:Users/mwend/Downloads/Generated_Emails"  # each format is written to OUTPUT_PATH.<format>
+OUTPUT_FORMATS = ("xlsx", "csv", "tsv")  # "parquet" and "feather" are fast binary outputs (need pyarrow)
+EXPORT_EXECUTOR = "thread"  # "process" sidesteps the GIL for the pure-Python xlsx writer at the cost of pickling
+STREAMING = False  # process the roster in row chunks so memory stays flat whatever the input size
+CHUNK_SIZE = 50_000  # rows per chunk in streaming mode
+SEPARATORS = {"csv": ",", "tsv": "\t"}
+PARSE_CACHE_DIR = "roster_cache"  # parsed workbooks are kept here as Feather files, None disables the cache
+BATCH_RETRIES = 1  # extra attempts for a roster file that fails to load in batch mode
+ROSTER_EXTENSIONS = ("xlsx", "csv", "tsv")
+NORMALIZE_NAMES = True  # fold accents and other scripts to a-z before building addresses
+COMPACT_DTYPES = False  # categorical Gender and Arrow-backed name columns instead of object dtype (need pyarrow)
+UNIQUE_EMAILS = True  # add numeric suffixes so no address is issued twice
+EXISTING_EMAILS_PATH = None  # previous output file or directory of exports whose addresses are already taken
 
-print(df.info())
-df[["Surname", "Other Names"]] = df["Student Name"].str.split(",", expand=True)
+
+# "Surname, Other Names" as exactly two columns, whatever names a chunk happens to hold. Only the
+# first comma splits, and a name without one has no Other Names.
+def split_student_names(names):
+    return names.str.split(",", n=1, expand=True).reindex(columns=[0, 1])
 
 
-df["Surname"] = (df["Surname"]
-                 .astype(str)
-                 .str.replace("'", "", regex=False)
-                 .str.strip())
-df["Other Names"] = (df["Other Names"]
+# Split "Surname, Other Names" and build the email address for every row of a roster frame
+def add_email_columns(df, compact=COMPACT_DTYPES):
+    if compact:
+        return add_email_columns_compact(df)
+    parts = split_student_names(df["Student Name"]).astype(object)
+    df[["Surname", "Other Names"]] = parts.where(parts.notna(), None)
+
+    df["Surname"] = (df["Surname"]
                      .astype(str)
                      .str.replace("'", "", regex=False)
                      .str.strip())
+    df["Other Names"] = (df["Other Names"]
+                         .astype(str)
+                         .str.replace("'", "", regex=False)
+                         .str.strip())
+
+    df["Email Address"] = build_email_addresses(df["Other Names"], df["Surname"])
+    return df
+
+
+# First letter of the other names plus the surname, each normalized once per distinct value
+def build_email_addresses(other_names, surnames, normalize=NORMALIZE_NAMES):
+    if normalize:
+        other_names = normalize_column(other_names)
+        surnames = normalize_column(surnames)
+    return other_names.str[0].str.lower() + surnames.str.lower() + "@gmail.com"
+
+
+# Same rules on compact dtypes: Gender becomes categorical and the name columns are Arrow-backed
+# strings, so the split/strip/lower/concatenate steps run in Arrow kernels instead of Python loops.
+# Missing names stay missing instead of becoming the text "None".
+def add_email_columns_compact(df):
+    df["Gender"] = df["Gender"].astype("category")
+    names = df["Student Name"].astype("string[pyarrow]")
+    df[["Surname", "Other Names"]] = split_student_names(names)
+    for column in ("Surname", "Other Names"):
+        df[column] = df[column].astype("string[pyarrow]").str.replace("'", "", regex=False).str.strip()
+    df["Email Address"] = build_email_addresses(df["Other Names"], df["Surname"])
+    return df
+
+
+# Run both pipelines on the same roster and print their memory use and time
+def compare_dtype_modes(input_path):
+    roster = read_roster(input_path)
+    for label, compact in (("object", False), ("compact", True)):
+        df = roster.copy(deep=True)
+        start = time.perf_counter()
+        add_email_columns(df, compact=compact)
+        elapsed = time.perf_counter() - start
+        memory = df.memory_usage(deep=True).sum()
+        print(f"{label:>8}: {elapsed * 1000:9.1f} ms {memory / 2 ** 20:9.2f} MiB")
+
+
+def make_allocator(existing_emails_path=EXISTING_EMAILS_PATH):
+    allocator = EmailAllocator()
+    if existing_emails_path:
+        allocator.load_existing(existing_emails_path)
+    return allocator
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as input_file:
+        for block in iter(lambda: input_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Parse a workbook once and keep the sheet as Feather keyed by path, size, mtime and content hash.
+# Unchanged size and mtime is a hit without rereading the source; otherwise the content hash
+# decides, so a touched but identical file still hits and any edit forces a fresh parse.
+def read_excel_cached(path, cache_dir=PARSE_CACHE_DIR):
+    if not cache_dir:
+        return pd.read_excel(path)
+    absolute_path = os.path.abspath(path)
+    entry = os.path.join(cache_dir, hashlib.sha1(absolute_path.encode("utf-8")).hexdigest()[:16])
+    stat = os.stat(path)
+    meta = None
+    if os.path.exists(entry + ".json") and os.path.exists(entry + ".feather"):
+        with open(entry + ".json") as meta_file:
+            meta = json.load(meta_file)
+    if meta is not None and meta["path"] == absolute_path and meta["size"] == stat.st_size:
+        if meta["mtime_ns"] == stat.st_mtime_ns:
+            return pd.read_feather(entry + ".feather")
+        digest = file_digest(path)
+        if meta["sha256"] == digest:
+            meta["mtime_ns"] = stat.st_mtime_ns
+            with open(entry + ".json", "w") as meta_file:
+                json.dump(meta, meta_file)
+            return pd.read_feather(entry + ".feather")
+    else:
+        digest = file_digest(path)
+
+    df = pd.read_excel(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        df.to_feather(entry + ".feather")
+    except (TypeError, ValueError) as error:
+        # Columns that mix types cannot be stored as Arrow; such sheets are simply not cached.
+        # A missing pyarrow is not caught here: it is a broken install, not an uncacheable sheet.
+        print(f"Not caching {path}: {error}")
+        return df
+    with open(entry + ".json", "w") as meta_file:
+        json.dump({"path": absolute_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest}, meta_file)
+    return df
+
+
+# Load a whole roster from a workbook (through the parse cache) or from a CSV/TSV export
+def read_roster(input_path):
+    extension = os.path.splitext(input_path)[1].lower().lstrip(".")
+    if extension in SEPARATORS:
+        return pd.read_csv(input_path, sep=SEPARATORS[extension])
+    return read_excel_cached(input_path)
+
+
+def generate_emails(input_path, output_path, formats=OUTPUT_FORMATS):
+    df = read_roster(input_path)
+
+    print(df.info())
+    add_email_columns(df)
+    if UNIQUE_EMAILS:
+        allocator = make_allocator()
+        df["Email Address"] = allocator.allocate(df["Email Address"])
+        print(f"{allocator.collisions_resolved} duplicate email addresses given a numeric suffix")
+
+    female_students = df[df["Gender"] == "F"]
+    male_students = df[df["Gender"] == "M"]
+    print(female_students)
+    print(male_students)
+    print(df)
+    print_export_report(export_roster(df, output_path, formats))
+
+
+# Write one output format and report how long it took and how big it is
+def write_roster(df, output_path, extension):
+    path = f"{output_path}.{extension}"
+    start = time.perf_counter()
+    if extension == "xlsx":
+        df.to_excel(path, index=False)
+    elif extension == "parquet":
+        df.to_parquet(path, index=False)
+    elif extension == "feather":
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, sep=SEPARATORS[extension], index=False)
+    return {"format": extension, "path": path, "seconds": time.perf_counter() - start, "bytes": os.path.getsize(path)}
+
+
+# Write every requested format at the same time so the fast ones do not wait behind xlsx
+def export_roster(df, output_path, formats=OUTPUT_FORMATS, executor=EXPORT_EXECUTOR):
+    pool_class = concurrent.futures.ProcessPoolExecutor if executor == "process" else concurrent.futures.ThreadPoolExecutor
+    with pool_class(max_workers=max(1, len(formats))) as pool:
+        futures = [pool.submit(write_roster, df, output_path, extension) for extension in formats]
+        return [future.result() for future in futures]
+
+
+def print_export_report(results):
+    for result in sorted(results, key=lambda result: result["seconds"], reverse=True):
+        print(f"{result['format']:>8}: {result['seconds']:7.3f}s {result['bytes'] / 1024:10.1f} KiB  {result['path']}")
+
+
+# Yield the roster in DataFrames of at most chunk_size rows: read-only openpyxl for workbooks,
+# chunked pandas readers for CSV/TSV
+def read_roster_chunks(input_path, chunk_size=CHUNK_SIZE):
+    extension = os.path.splitext(input_path)[1].lower().lstrip(".")
+    if extension in SEPARATORS:
+        yield from pd.read_csv(input_path, sep=SEPARATORS[extension], chunksize=chunk_size)
+        return
+    workbook = openpyxl.load_workbook(input_path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        while header is not None:
+            batch = list(itertools.islice(rows, chunk_size))
+            if not batch:
+                break
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+# Append roster chunks to every output format as they are produced
+class ChunkedRosterWriter:
+    def __init__(self, output_path, formats=OUTPUT_FORMATS):
+        self.output_path = output_path
+        self.formats = formats
+        self.rows = 0
+        unsupported = set(formats) - set(SEPARATORS) - {"xlsx"}
+        if unsupported:
+            raise ValueError(f"Streaming mode cannot write {', '.join(sorted(unsupported))} output")
+        self._files = {extension: open(f"{output_path}.{extension}", "w", newline="", encoding="utf-8")
+                       for extension in formats if extension in SEPARATORS}
+        self._workbook = None
+        if "xlsx" in formats:
+            self._workbook = openpyxl.Workbook(write_only=True)
+            self._sheet = self._workbook.create_sheet()
+
+    def write(self, df):
+        for extension, output_file in self._files.items():
+            df.to_csv(output_file, sep=SEPARATORS[extension], index=False, header=self.rows == 0)
+        if self._workbook is not None:
+            if self.rows == 0:
+                self._sheet.append(list(df.columns))
+            for row in df.itertuples(index=False):
+                self._sheet.append([None if pd.isna(value) else value for value in row])
+        self.rows += len(df)
+
+    def close(self):
+        for output_file in self._files.values():
+            output_file.close()
+        if self._workbook is not None:
+            self._workbook.save(f"{self.output_path}.xlsx")
+
+
+def generate_emails_streaming(input_path, output_path, formats=OUTPUT_FORMATS, chunk_size=CHUNK_SIZE):
+    counts = {"rows": 0, "female": 0, "male": 0}
+    allocator = make_allocator() if UNIQUE_EMAILS else None
+    writer = ChunkedRosterWriter(output_path, formats)
+    try:
+        for chunk in read_roster_chunks(input_path, chunk_size):
+            add_email_columns(chunk)
+            if allocator is not None:
+                chunk["Email Address"] = allocator.allocate(chunk["Email Address"])
+            writer.write(chunk)
+            counts["rows"] += len(chunk)
+            counts["female"] += int((chunk["Gender"] == "F").sum())
+            counts["male"] += int((chunk["Gender"] == "M").sum())
+    finally:
+        writer.close()
+    print(f"{counts['rows']} students ({counts['female']} female, {counts['male']} male) written to {output_path}")
+    if allocator is not None:
+        print(f"{allocator.collisions_resolved} duplicate email addresses given a numeric suffix")
+    return counts
+
+
+# Expand directories and glob patterns into a sorted list of roster files
+def find_roster_files(inputs):
+    paths = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            for extension in ROSTER_EXTENSIONS:
+                paths.update(glob.glob(os.path.join(pattern, f"*.{extension}")))
+        else:
+            paths.update(glob.glob(pattern) or ([pattern] if os.path.exists(pattern) else []))
+    return sorted(path for path in paths if not os.path.basename(path).startswith("~$"))
+
+
+# Batch worker: load one roster and apply the name and email rules, retrying transient failures
+def load_email_roster(input_path, retries=BATCH_RETRIES):
+    start = time.perf_counter()
+    for attempt in range(retries + 1):
+        try:
+            df = add_email_columns(read_roster(input_path))
+            return df, attempt + 1, time.perf_counter() - start
+        except Exception:
+            if attempt == retries:
+                raise
+
+
+# Process many roster files on a process pool: load and build emails in parallel, make the
+# addresses unique across the whole batch in file order, then export every file and the merged
+# roster in parallel. A file that keeps failing is reported and left out of the merged output.
+def generate_emails_batch(input_paths, output_dir, formats=OUTPUT_FORMATS, merged_name="Generated_Emails",
+                          workers=None, retries=BATCH_RETRIES):
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    loaded = {}
+    failures = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(load_email_roster, path, retries): path for path in input_paths}
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                loaded[path] = future.result()
+            except Exception as error:
+                failures[path] = f"{type(error).__name__}: {error}"
+                print(f"FAILED {path}: {failures[path]}")
+
+        paths = [path for path in input_paths if path in loaded]
+        allocator = make_allocator() if UNIQUE_EMAILS else None
+        frames = []
+        for path in paths:
+            df = loaded[path][0]
+            if allocator is not None:
+                df["Email Address"] = allocator.allocate(df["Email Address"])
+            frames.append(df)
+
+        exports = {}
+        for path, df in zip(paths, frames):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            exports[pool.submit(export_roster, df, os.path.join(output_dir, f"{stem}_emails"), formats, "thread")] = path
+        if frames:
+            merged = pd.concat([df.assign(**{"Source File": os.path.basename(path)}) for path, df in zip(paths, frames)],
+                               ignore_index=True)
+            exports[pool.submit(export_roster, merged, os.path.join(output_dir, merged_name), formats, "thread")] = "merged"
+        for future in concurrent.futures.as_completed(exports):
+            try:
+                future.result()
+            except Exception as error:
+                failures[exports[future]] = f"{type(error).__name__}: {error}"
+                print(f"FAILED writing {exports[future]}: {failures[exports[future]]}")
+
+    elapsed = time.perf_counter() - start
+    rows = sum(len(df) for df in frames)
+    retried = sum(1 for path in paths if loaded[path][1] > 1)
+    print(f"{len(paths)} of {len(input_paths)} files processed ({retried} after a retry, {len(failures)} failed), "
+          f"{rows} students in {elapsed:.2f}s: {len(paths) / elapsed:.1f} files/s, {rows / elapsed:.0f} rows/s")
+    if allocator is not None:
+        print(f"{allocator.collisions_resolved} duplicate email addresses given a numeric suffix")
+    return {"files": len(paths), "failed": failures, "rows": rows, "seconds": elapsed}
 
 
-df["Email Address"] = df["Other Names"].str[0].str.lower() + df["Surname"].str.lower() + "@gmail.com"
-female_students=df[df["Gender"]=="F"]
-male_students=df[df["Gender"]=="M"]
-special_names=df[df["Student Name"]]
-print(female_students)
-print(male_students)
-print(df)
-df.to_excel("C:Users/mwend/Downloads/Generated_Emails.xlsx", index=False)
-df.to_csv("C:Users/mwend/Downloads/Generated_Emails.csv", index=False)
-df.to_csv("C:Users/mwend/Downloads/Generated_Emails.tsv",sep='\t', index=False)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate student email addresses from roster files")
+    parser.add_argument("inputs", nargs="*", help="roster files, directories or glob patterns (default: INPUT_PATH)")
+    parser.add_argument("--output-dir", help="write one output per roster plus a merged output here")
+    parser.add_argument("--formats", nargs="+", default=list(OUTPUT_FORMATS))
+    parser.add_argument("--merged-name", default="Generated_Emails")
+    parser.add_argument("--workers", type=int, help="processes in the batch pool (default: one per core)")
+    parser.add_argument("--retries", type=int, default=BATCH_RETRIES)
+    parser.add_argument("--compare-dtypes", action="store_true",
+                        help="time the object and compact dtype pipelines on the input and exit")
+    args = parser.parse_args()
 
+    if args.compare_dtypes:
+        for input_path in find_roster_files(args.inputs or [INPUT_PATH]):
+            print(input_path)
+            compare_dtype_modes(input_path)
+    elif args.inputs or args.output_dir:
+        input_paths = find_roster_files(args.inputs or [INPUT_PATH])
+        if not input_paths:
+            parser.error("no roster files matched")
+        generate_emails_batch(input_paths, args.output_dir or os.path.dirname(OUTPUT_PATH) or ".", args.formats,
+                              args.merged_name, args.workers, args.retries)
+    elif STREAMING:
+        generate_emails_streaming(INPUT_PATH, OUTPUT_PATH, args.formats)
+    else:
+        generate_emails(INPUT_PATH, OUTPUT_PATH, args.formats)
@@ -0,0 +1,20 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+BLOCK_SIZE = 4096  # male names compared per sparse matrix product
+
+
+# Propose candidate pairs whose character n-gram TF-IDF cosine similarity is at or above threshold.
+# Yields (male indices, female indices, lexical scores) one block of male names at a time.
+def lexical_candidate_pairs(male_names, female_names, threshold, ngram_range=(2, 3), block_size=BLOCK_SIZE):
+    if not len(male_names) or not len(female_names):
+        return
+    vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=ngram_range, lowercase=True, dtype=np.float32)
+    vectorizer.fit(np.concatenate([np.asarray(male_names, dtype=str), np.asarray(female_names, dtype=str)]))
+    male_vectors = vectorizer.transform(np.asarray(male_names, dtype=str))
+    female_vectors_t = vectorizer.transform(np.asarray(female_names, dtype=str)).T.tocsr()
+    for start in range(0, male_vectors.shape[0], block_size):
+        tile = (male_vectors[start:start + block_size] @ female_vectors_t).tocoo()
+        keep = tile.data >= threshold
+        if keep.any():
+            yield tile.row[keep] + start, tile.col[keep], tile.data[keep]
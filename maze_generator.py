@@ -0,0 +1,103 @@
+import random
+import time
+
+import numpy as np
+
+# A maze of rows x cols cells is stored as a (2 * rows + 1, 2 * cols + 1) boolean tile grid, True for wall.
+# Cells sit on odd coordinates; the tiles between two cells are either wall or an opened passage.
+
+
+def tile_shape(rows, cols):
+    return 2 * rows + 1, 2 * cols + 1
+
+
+# Convert a list of strings with "#" for walls, such as the hand-drawn maze in mazegame.py
+def from_strings(rows):
+    return np.array([[cell == "#" for cell in row] for row in rows], dtype=bool)
+
+
+# Seeded iterative recursive backtracker. Works on flat bytearrays because indexing them from
+# Python is much cheaper than indexing a NumPy array one element at a time.
+def backtracker(rows, cols, seed=None):
+    rng = random.Random(seed)
+    height, width = tile_shape(rows, cols)
+    tiles = bytearray(b"\x01") * (height * width)
+    visited = bytearray(rows * cols)
+
+    def tile(cell):
+        row, col = divmod(cell, cols)
+        return (2 * row + 1) * width + 2 * col + 1
+
+    start = rng.randrange(rows * cols)
+    visited[start] = 1
+    tiles[tile(start)] = 0
+    stack = [start]
+    while stack:
+        cell = stack[-1]
+        row, col = divmod(cell, cols)
+        neighbours = []
+        if row > 0 and not visited[cell - cols]:
+            neighbours.append(cell - cols)
+        if row < rows - 1 and not visited[cell + cols]:
+            neighbours.append(cell + cols)
+        if col > 0 and not visited[cell - 1]:
+            neighbours.append(cell - 1)
+        if col < cols - 1 and not visited[cell + 1]:
+            neighbours.append(cell + 1)
+        if not neighbours:
+            stack.pop()
+            continue
+        following = neighbours[rng.randrange(len(neighbours))] if len(neighbours) > 1 else neighbours[0]
+        visited[following] = 1
+        # The wall between two cells is the tile halfway between them
+        tiles[(tile(cell) + tile(following)) // 2] = 0
+        tiles[tile(following)] = 0
+        stack.append(following)
+    return np.frombuffer(tiles, dtype=bool).reshape(height, width)
+
+
+# Seeded randomized Kruskal: open the walls between adjacent cells in random order whenever the
+# two cells are not yet connected, tracked with a union-find over cell ids
+def kruskal(rows, cols, seed=None):
+    rng = np.random.default_rng(seed)
+    ids = np.arange(rows * cols).reshape(rows, cols)
+    first = np.concatenate([ids[:, :-1].ravel(), ids[:-1, :].ravel()])
+    second = np.concatenate([ids[:, 1:].ravel(), ids[1:, :].ravel()])
+    order = rng.permutation(len(first))
+    parent = list(range(rows * cols))
+
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    opened = bytearray(len(first))
+    for wall, a, b in zip(order.tolist(), first[order].tolist(), second[order].tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_a] = root_b
+            opened[wall] = 1
+
+    grid = np.ones(tile_shape(rows, cols), dtype=bool)
+    grid[1::2, 1::2] = False
+    passages = np.frombuffer(opened, dtype=bool)
+    first_rows, first_cols = np.divmod(first[passages], cols)
+    second_rows, second_cols = np.divmod(second[passages], cols)
+    grid[first_rows + second_rows + 1, first_cols + second_cols + 1] = False
+    return grid
+
+
+MAZE_ALGORITHMS = {"backtracker": backtracker, "kruskal": kruskal}
+
+
+def generate_maze(rows, cols, seed=None, algorithm="backtracker"):
+    return MAZE_ALGORITHMS[algorithm](rows, cols, seed)
+
+
+if __name__ == "__main__":
+    for size in (100, 500, 1000, 2000):
+        for name in MAZE_ALGORITHMS:
+            start = time.perf_counter()
+            grid = generate_maze(size, size, seed=0, algorithm=name)
+            print(f"{name:>11} {size}x{size}: {time.perf_counter() - start:.2f}s, {grid.nbytes / 1e6:.1f} MB")
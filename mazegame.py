@@ -1,5 +1,20 @@
+import argparse
+import collections
+import os
 import pygame
+import re
 import sys
+import time
+
+import numpy as np
+
+import distance_field
+import marble_collision
+import maze_generator
+
+# Headless runs need SDL's dummy video driver before pygame opens the window
+if "--headless" in sys.argv:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
 
 # Initialize Pygame
 pygame.init()
@@ -8,19 +23,37 @@ pygame.init()
 WIDTH, HEIGHT = 700, 500
 CELL_SIZE = 40
 MARBLE_RADIUS = 15
-SPEED = 5
+SPEED = 5  # pixels per update along each axis; collisions are swept, so any speed is safe
+UPDATES_PER_SECOND = 60  # fixed simulation rate, independent of the frame rate
+TIMESTEP = 1 / UPDATES_PER_SECOND
+MAX_FPS = 120
+MAX_FRAME_TIME = 0.25  # longest frame the simulation catches up on, so a stall cannot snowball
+FRAME_REPORT_INTERVAL = 120  # frames between draw-time reports
+FULL_REDRAW = False  # redraw every visible wall each frame instead of using cached chunks, for comparison
+CHUNK_TILES = 16  # maze tiles per side of one cached chunk surface
+CHUNK_CACHE_SIZE = 64  # chunk surfaces kept around, several viewports' worth
+HINT_LENGTH = 60  # route tiles shown by the hint
 
 # Colors
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 PINK = (255, 105, 180)  # Define pink color
+GREEN = (40, 180, 80)
+BLUE = (70, 140, 255)
 
 # Create the screen
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("Marble Maze")
 
-# Marble position
+# Marble position, and where it was one update earlier for interpolated drawing
 marble_pos = [CELL_SIZE * 3 + CELL_SIZE // 2, CELL_SIZE * 1 + CELL_SIZE // 2]  # Start in an open space
+previous_pos = marble_pos
+
+# Input script names: arrow keys held during an update, H/A pressed at its start, and
+# WALL:<row>:<column> for a click that toggled that tile before it
+KEYS = {"LEFT": pygame.K_LEFT, "RIGHT": pygame.K_RIGHT, "UP": pygame.K_UP, "DOWN": pygame.K_DOWN}
+TOGGLES = {"H": pygame.K_h, "A": pygame.K_a}
+WALL_INPUT = re.compile(r"WALL:(\d+):(\d+)")
 
 # Maze layout
 maze = [
@@ -35,12 +68,129 @@ maze = [
     "#################",
 ]
 
-# Function to draw the maze
-def draw_maze():
-    for y, row in enumerate(maze):
-        for x, cell in enumerate(row):
-            if cell == "#":
-                pygame.draw.rect(screen, BLACK, (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+# Wall grid the game runs on, True for wall; either the layout above or a generated maze.
+# The exit is the open tile next to the bottom-right corner.
+walls = maze_generator.from_strings(maze)
+goal_tile = (walls.shape[0] - 2, walls.shape[1] - 2)
+
+
+class ChunkCache:
+    # Surfaces for square blocks of CHUNK_TILES x CHUNK_TILES tiles, rendered the first time they
+    # come into view and evicted least recently used first
+
+    def __init__(self, grid, goal):
+        self.grid = grid
+        self.goal = goal
+        self.surfaces = collections.OrderedDict()
+        self.rendered = 0
+
+    def get(self, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = self.render(chunk_x, chunk_y)
+            if len(self.surfaces) > CHUNK_CACHE_SIZE:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    # Drop the chunk holding a tile so it is rendered again with the tile's new contents
+    def invalidate(self, tile):
+        self.surfaces.pop((tile[1] // CHUNK_TILES, tile[0] // CHUNK_TILES), None)
+
+    # One pixel per tile, scaled up by CELL_SIZE, instead of a draw call per wall
+    def render(self, chunk_x, chunk_y):
+        block = self.grid[chunk_y * CHUNK_TILES:(chunk_y + 1) * CHUNK_TILES,
+                          chunk_x * CHUNK_TILES:(chunk_x + 1) * CHUNK_TILES]
+        colours = np.where(block.T[:, :, None], BLACK, WHITE).astype(np.uint8)
+        goal_x, goal_y = self.goal[1] - chunk_x * CHUNK_TILES, self.goal[0] - chunk_y * CHUNK_TILES
+        if 0 <= goal_x < colours.shape[0] and 0 <= goal_y < colours.shape[1]:
+            colours[goal_x, goal_y] = GREEN
+        small = pygame.surfarray.make_surface(colours)
+        self.rendered += 1
+        return pygame.transform.scale(small, (block.shape[1] * CELL_SIZE, block.shape[0] * CELL_SIZE)).convert()
+
+
+chunks = ChunkCache(walls, goal_tile)
+field = distance_field.DistanceField(walls, goal_tile)
+collisions = marble_collision.CollisionGrid(walls, CELL_SIZE)
+
+
+# Switch to another maze and put the marble in the middle of the given tile
+def load_maze(grid, start_tile=(1, 1)):
+    global walls, goal_tile, chunks, field, collisions, marble_pos, previous_pos
+    walls = grid if grid.flags.writeable else grid.copy()
+    goal_tile = (walls.shape[0] - 2, walls.shape[1] - 2)
+    chunks = ChunkCache(walls, goal_tile)
+    field = distance_field.DistanceField(walls, goal_tile)
+    collisions = marble_collision.CollisionGrid(walls, CELL_SIZE)
+    marble_pos = [start_tile[0] * CELL_SIZE + CELL_SIZE // 2, start_tile[1] * CELL_SIZE + CELL_SIZE // 2]
+    previous_pos = marble_pos
+
+# The (row, column) tile under a position, and the position of a tile's centre
+def tile_at(position):
+    return int(position[1] // CELL_SIZE), int(position[0] // CELL_SIZE)
+
+def tile_centre(tile):
+    return [tile[1] * CELL_SIZE + CELL_SIZE // 2, tile[0] * CELL_SIZE + CELL_SIZE // 2]
+
+# Turn a tile into a wall or open it, keeping the distance field and the chunk surfaces current
+def toggle_wall(tile):
+    if tile == goal_tile or marble_collision.circle_hits_tile(*marble_pos, MARBLE_RADIUS, tile, CELL_SIZE):
+        return
+    if not (0 < tile[0] < walls.shape[0] - 1 and 0 < tile[1] < walls.shape[1] - 1):
+        return
+    start = time.perf_counter()
+    recomputed = field.set_wall(tile, not walls[tile])
+    chunks.invalidate(tile)
+    print(f"distance field repaired in {(time.perf_counter() - start) * 1000:.2f} ms ({recomputed} tiles)")
+
+# Auto-solve: velocity towards the centre of the next tile on the route, at most SPEED per axis
+def auto_solve_velocity(position):
+    next_tile = field.next_step(tile_at(position))
+    if next_tile is None:
+        return [0, 0]
+    target = tile_centre(next_tile)
+    return [max(-SPEED, min(SPEED, target[0] - position[0])), max(-SPEED, min(SPEED, target[1] - position[1]))]
+
+# Top-left world pixel of the viewport, following the marble but staying inside the maze
+def camera_for(position):
+    world_width, world_height = walls.shape[1] * CELL_SIZE, walls.shape[0] * CELL_SIZE
+    x = min(max(position[0] - WIDTH // 2, 0), max(world_width - WIDTH, 0))
+    y = min(max(position[1] - HEIGHT // 2, 0), max(world_height - HEIGHT, 0))
+    return x, y
+
+# Function to draw the maze: every wall tile in the viewport, one rect each
+def draw_maze(camera):
+    first_x, first_y = camera[0] // CELL_SIZE, camera[1] // CELL_SIZE
+    visible = walls[first_y:first_y + HEIGHT // CELL_SIZE + 2, first_x:first_x + WIDTH // CELL_SIZE + 2]
+    for y, x in zip(*np.nonzero(visible)):
+        pygame.draw.rect(screen, BLACK, ((first_x + x) * CELL_SIZE - camera[0],
+                                         (first_y + y) * CELL_SIZE - camera[1], CELL_SIZE, CELL_SIZE))
+
+# Restore a screen area from the cached chunks that overlap it
+def draw_chunks(camera, area):
+    chunk_pixels = CHUNK_TILES * CELL_SIZE
+    world = area.move(camera)
+    last_x, last_y = (walls.shape[1] - 1) // CHUNK_TILES, (walls.shape[0] - 1) // CHUNK_TILES
+    screen.set_clip(area)
+    screen.fill(WHITE, area)
+    for chunk_y in range(max(world.top // chunk_pixels, 0), min((world.bottom - 1) // chunk_pixels, last_y) + 1):
+        for chunk_x in range(max(world.left // chunk_pixels, 0), min((world.right - 1) // chunk_pixels, last_x) + 1):
+            screen.blit(chunks.get(chunk_x, chunk_y), (chunk_x * chunk_pixels - camera[0], chunk_y * chunk_pixels - camera[1]))
+    screen.set_clip(None)
+
+# Dots along the next HINT_LENGTH tiles of the route to the exit
+def draw_route(position, camera):
+    for tile in field.route(tile_at(position), HINT_LENGTH):
+        x, y = tile_centre(tile)
+        pygame.draw.circle(screen, BLUE, (x - camera[0], y - camera[1]), CELL_SIZE // 8)
+
+# Screen area covered by the marble at a position
+def marble_rect(position, camera):
+    return pygame.Rect(int(position[0] - camera[0]) - MARBLE_RADIUS - 1, int(position[1] - camera[1]) - MARBLE_RADIUS - 1,
+                       MARBLE_RADIUS * 2 + 3, MARBLE_RADIUS * 2 + 3)
 
 # Function to draw a gradient circle to simulate a sphere
 def draw_sphere(position):
@@ -51,52 +201,202 @@ def draw_sphere(position):
         color = (255, color_value, color_value)  # Full pink with varying shades
         pygame.draw.circle(screen, color, (position[0], position[1]), i)
 
-# Check for collisions with walls
-def is_collision(position):
-    x, y = position
-    # Calculate the cell position
-    cell_x = x // CELL_SIZE
-    cell_y = y // CELL_SIZE
-    # Check if the cell is a wall
-    if maze[cell_y][cell_x] == "#":
-        return True
-    return False
-
-# Main game loop
-def main():
-    global marble_pos  # Declare marble_pos as global
+# Advance the game by one fixed timestep with the given input names held or pressed
+def update(inputs, auto_solve):
+    global marble_pos, previous_pos
+    velocity = auto_solve_velocity(marble_pos) if auto_solve else [0, 0]
+
+    if "LEFT" in inputs:
+        velocity[0] -= SPEED
+    if "RIGHT" in inputs:
+        velocity[0] += SPEED
+    if "UP" in inputs:
+        velocity[1] -= SPEED
+    if "DOWN" in inputs:
+        velocity[1] += SPEED
+
+    # Sweep the marble along its velocity, sliding along any wall it meets
+    previous_pos = marble_pos
+    marble_pos = collisions.move(marble_pos, velocity, MARBLE_RADIUS)
+
+# Where to draw the marble a fraction alpha of the way from the last update to the next
+def interpolated_pos(alpha):
+    return [previous_pos[0] + (marble_pos[0] - previous_pos[0]) * alpha,
+            previous_pos[1] + (marble_pos[1] - previous_pos[1]) * alpha]
+
+
+class Renderer:
+    # Draws frames. While the view stays put and no overlay is shown, only the marble's old and
+    # new rects are restored from the chunk cache and pushed to the display.
+
+    def __init__(self):
+        self.camera = None
+        self.rect = None
+        self.show_hint = False
+
+    def draw(self, position, show_hint, maze_changed=False):
+        camera = camera_for((int(position[0]), int(position[1])))
+        marble_on_screen = (position[0] - camera[0], position[1] - camera[1])
+        new_rect = marble_rect(position, camera)
+        if FULL_REDRAW:
+            screen.fill(WHITE)
+            draw_maze(camera)
+            if show_hint:
+                draw_route(position, camera)
+            draw_sphere(marble_on_screen)
+            pygame.display.flip()
+        elif camera != self.camera or show_hint or self.show_hint or maze_changed:
+            # The view scrolled or the overlay changed; blit only the chunks in view
+            draw_chunks(camera, screen.get_rect())
+            if show_hint:
+                draw_route(position, camera)
+            draw_sphere(marble_on_screen)
+            pygame.display.flip()
+        else:
+            # Put back the maze under the old marble, then push only the changed rects
+            draw_chunks(camera, self.rect)
+            draw_sphere(marble_on_screen)
+            pygame.display.update([self.rect, new_rect])
+        self.camera, self.rect, self.show_hint = camera, new_rect, show_hint
+
+
+# Per-update input sets from a script: lines of "<updates> [LEFT RIGHT UP DOWN H A WALL:r:c ...]",
+# the named inputs repeated for that many updates, with # comments
+def read_input_script(path):
+    with open(path) as script:
+        for number, line in enumerate(script, 1):
+            fields = line.split("#")[0].split()
+            if not fields:
+                continue
+            inputs = frozenset(name.upper() for name in fields[1:])
+            unknown = {name for name in inputs - KEYS.keys() - TOGGLES.keys() if not WALL_INPUT.fullmatch(name)}
+            if unknown or not fields[0].isdigit():
+                raise ValueError(f"{path}:{number}: cannot read {line.strip()!r}")
+            for _ in range(int(fields[0])):
+                yield inputs
+
+# Write per-update input sets as a script, one line per run of identical updates
+def write_input_script(path, updates):
+    with open(path, "w") as script:
+        script.write("# updates  keys held (LEFT RIGHT UP DOWN), pressed (H hint, A auto-solve) "
+                     "or wall tiles clicked (WALL:row:column)\n")
+        count, current = 0, None
+        for inputs in updates + [None]:
+            if inputs != current and count:
+                script.write(" ".join([str(count)] + sorted(current)) + "\n")
+                count = 0
+            current = inputs
+            count += 1
+
+# Apply the one-shot inputs of an update: the hint and auto-solve toggles and wall clicks. Clicks
+# are applied here rather than when they happen, so a recorded script replays them at the same step.
+# Returns the new (show_hint, auto_solve, maze_changed).
+def apply_pressed(inputs, show_hint, auto_solve):
+    maze_changed = False
+    for name in inputs:
+        wall = WALL_INPUT.fullmatch(name)
+        if name == "H":
+            show_hint = not show_hint
+        elif name == "A":
+            auto_solve = not auto_solve
+        elif wall:
+            toggle_wall((int(wall.group(1)), int(wall.group(2))))
+            maze_changed = True
+    return show_hint, auto_solve, maze_changed
+
+# Main game loop: the simulation advances in fixed steps of TIMESTEP, as many as the elapsed time
+# calls for, and each frame draws the marble interpolated between the last two steps
+def main(record_path=None):
+    clock = pygame.time.Clock()
+    renderer = Renderer()
+    renderer.draw(marble_pos, False, True)
+    draw_times = []
+    recording = []
+    pressed = set()
+    show_hint = auto_solve = False
+    accumulator = 0.0
     while True:
+        maze_changed = False
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if record_path:
+                    write_input_script(record_path, recording)
                 pygame.quit()
                 sys.exit()
+            # H shows the route to the exit, A lets the marble follow it, clicking toggles a wall
+            elif event.type == pygame.KEYDOWN and event.key in TOGGLES.values():
+                pressed.add(next(name for name, key in TOGGLES.items() if key == event.key))
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                pressed.add("WALL:%d:%d" % tile_at((event.pos[0] + renderer.camera[0], event.pos[1] + renderer.camera[1])))
 
         keys = pygame.key.get_pressed()
-        new_marble_pos = marble_pos.copy()
+        held = {name for name, key in KEYS.items() if keys[key]}
 
-        if keys[pygame.K_LEFT]:
-            new_marble_pos[0] -= SPEED
-        if keys[pygame.K_RIGHT]:
-            new_marble_pos[0] += SPEED
-        if keys[pygame.K_UP]:
-            new_marble_pos[1] -= SPEED
-        if keys[pygame.K_DOWN]:
-            new_marble_pos[1] += SPEED
+        accumulator += min(clock.tick(MAX_FPS) / 1000, MAX_FRAME_TIME)
+        while accumulator >= TIMESTEP:
+            show_hint, auto_solve, toggled = apply_pressed(pressed, show_hint, auto_solve)
+            maze_changed = maze_changed or toggled
+            if record_path:
+                recording.append(frozenset(held | pressed))
+            update(held, auto_solve)
+            pressed = set()
+            accumulator -= TIMESTEP
 
-        # Check for collision before updating position
-        if not is_collision(new_marble_pos):
-            marble_pos = new_marble_pos
+        start = time.perf_counter()
+        renderer.draw(interpolated_pos(accumulator / TIMESTEP), show_hint, maze_changed)
+        draw_times.append(time.perf_counter() - start)
 
-        # Clear the screen
-        screen.fill(WHITE)
+        if len(draw_times) == FRAME_REPORT_INTERVAL:
+            print(f"draw {sum(draw_times) / len(draw_times) * 1000:.3f} ms/frame mean, "
+                  f"{max(draw_times) * 1000:.3f} ms max ({'full redraw' if FULL_REDRAW else 'cached chunks'}, "
+                  f"{chunks.rendered} chunks rendered)")
+            draw_times.clear()
 
-        # Draw the maze and the marble
-        draw_maze()
-        draw_sphere(marble_pos)
+# Headless benchmark: replay an input script as fast as possible, one update and one frame per
+# scripted step, and report the simulation rate and render time percentiles
+def run_benchmark(script_path):
+    renderer = Renderer()
+    renderer.draw(marble_pos, False, True)
+    update_times = []
+    render_times = []
+    show_hint = auto_solve = False
+    for inputs in read_input_script(script_path):
+        show_hint, auto_solve, maze_changed = apply_pressed(inputs, show_hint, auto_solve)
+        start = time.perf_counter()
+        update(inputs, auto_solve)
+        updated = time.perf_counter()
+        renderer.draw(marble_pos, show_hint, maze_changed)
+        pygame.event.pump()
+        update_times.append(updated - start)
+        render_times.append(time.perf_counter() - updated)
 
-        # Update the display
-        pygame.display.flip()
-        pygame.time.Clock().tick(60)
+    if not update_times:
+        raise ValueError(f"{script_path} has no updates")
+    p50, p95, p99 = np.percentile(np.array(render_times) * 1000, [50, 95, 99])
+    print(f"{len(update_times)} updates, {len(update_times) / sum(update_times):.0f} updates/s, "
+          f"{len(update_times) / (sum(update_times) + sum(render_times)):.0f} frames/s overall")
+    print(f"render ms: p50 {p50:.3f}, p95 {p95:.3f}, p99 {p99:.3f}, max {max(render_times) * 1000:.3f}")
+    print(f"marble ended at ({marble_pos[0]:.1f}, {marble_pos[1]:.1f}), tile {tile_at(marble_pos)}, "
+          f"exit {goal_tile}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Marble Maze")
+    parser.add_argument("--size", type=int, help="generate a square maze with this many cells per side")
+    parser.add_argument("--seed", type=int, help="seed for the generated maze")
+    parser.add_argument("--algorithm", choices=sorted(maze_generator.MAZE_ALGORITHMS), default="backtracker")
+    parser.add_argument("--speed", type=float, default=SPEED, help="marble speed in pixels per update")
+    parser.add_argument("--full-redraw", action="store_true", help="redraw the whole view every frame")
+    parser.add_argument("--record", metavar="SCRIPT", help="save the keys and wall clicks used while playing as an input script")
+    parser.add_argument("--headless", metavar="SCRIPT", help="replay an input script without a window and report timings")
+    args = parser.parse_args()
+
+    FULL_REDRAW = args.full_redraw
+    SPEED = args.speed
+    if args.size:
+        start = time.perf_counter()
+        load_maze(maze_generator.generate_maze(args.size, args.size, args.seed, args.algorithm))
+        print(f"Generated a {args.size}x{args.size} maze in {time.perf_counter() - start:.2f}s")
+    if args.headless:
+        run_benchmark(args.headless)
+    else:
+        main(args.record)
@@ -0,0 +1,47 @@
+import functools
+import re
+import unicodedata
+import warnings
+
+import pandas as pd
+
+try:
+    from unidecode import unidecode
+except ImportError:  # listed in requirements.txt; without it non-Latin scripts cannot be transliterated
+    unidecode = None
+
+# Latin letters that NFKD does not split into a base letter plus accents
+LATIN_FOLDS = str.maketrans({
+    "ß": "ss", "æ": "ae", "Æ": "AE", "œ": "oe", "Œ": "OE", "ø": "o", "Ø": "O", "đ": "d", "Đ": "D",
+    "ł": "l", "Ł": "L", "þ": "th", "Þ": "TH", "ð": "d", "Ð": "D", "ı": "i",
+})
+DISALLOWED = re.compile(r"[^a-z-]+")
+
+
+# Fold one name to the characters allowed in an email local part: NFKD with accents dropped,
+# transliterated to ASCII, lower-cased, and anything but a-z and "-" removed
+@functools.lru_cache(maxsize=1 << 20)
+def normalize_name(name):
+    folded = unicodedata.normalize("NFKD", name.translate(LATIN_FOLDS))
+    folded = "".join(character for character in folded if not unicodedata.combining(character))
+    if unidecode is not None:
+        folded = unidecode(folded)
+    elif not folded.isascii():
+        warnings.warn(f"unidecode is not installed, so the non-Latin letters in {name!r} are dropped; "
+                      "install it with 'pip install Unidecode'", RuntimeWarning)
+    return DISALLOWED.sub("", folded.lower()).strip("-")
+
+
+# Normalize a column once per distinct value and map the results back onto every row, keeping
+# string dtypes such as the Arrow-backed columns of the compact pipeline
+def normalize_column(values):
+    codes, uniques = pd.factorize(values)
+    if not len(uniques):
+        result = pd.Series(None, index=values.index, dtype=object)
+    else:
+        normalized = pd.Series([normalize_name(str(value)) for value in uniques], dtype=object)
+        result = pd.Series(normalized.to_numpy().take(codes), index=values.index, dtype=object)
+        result[codes == -1] = None
+    if isinstance(values.dtype, pd.StringDtype):
+        return result.astype(values.dtype)
+    return result
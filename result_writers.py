@@ -0,0 +1,115 @@
+import json
+import os
+import time
+
+PARQUET_ROW_GROUP_SIZE = 1_000_000  # matches buffered before a Parquet row group is written
+
+
+def _fsync_directory(path):
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+# One JSON object per line, written as each block of matches arrives
+class JsonlResultWriter:
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write_block(self, male_names, female_names, scores):
+        self._file.writelines(
+            json.dumps({"male_name": male_name, "female_name": female_name, "similarity": similarity}) + "\n"
+            for male_name, female_name, similarity in zip(male_names, female_names, scores.tolist())
+        )
+        self.rows += len(scores)
+
+    def close(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+# Columnar output through pyarrow, buffered into row groups of PARQUET_ROW_GROUP_SIZE matches
+class ParquetResultWriter:
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.path = path
+        self.rows = 0
+        self._schema = pa.schema([("male_name", pa.string()), ("female_name", pa.string()), ("similarity", pa.float32())])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._pending = []
+        self._pending_rows = 0
+
+    def write_block(self, male_names, female_names, scores):
+        self._pending.append(self._pa.record_batch([
+            self._pa.array(male_names, type=self._pa.string()),
+            self._pa.array(female_names, type=self._pa.string()),
+            self._pa.array(scores, type=self._pa.float32()),
+        ], schema=self._schema))
+        self._pending_rows += len(scores)
+        self.rows += len(scores)
+        if self._pending_rows >= PARQUET_ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._writer.write_table(self._pa.Table.from_batches(self._pending))
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+        with open(self.path, "rb+") as parquet_file:
+            os.fsync(parquet_file.fileno())
+
+
+RESULT_WRITERS = {
+    "jsonl": JsonlResultWriter,
+    "parquet": ParquetResultWriter,
+}
+
+
+# Stream (male indices, female indices, scores) blocks into every requested format, then write a
+# manifest describing the finished outputs. The manifest is fsync'd and renamed into place last,
+# so its presence means every output file is complete.
+def write_result_files(pairs, male_names, female_names, base_path, formats=("jsonl",), **run_info):
+    start = time.perf_counter()
+    # A manifest from an earlier run must not vouch for files that are about to be rewritten
+    manifest_path = f"{base_path}.manifest.json"
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+        _fsync_directory(manifest_path)
+    writers = [RESULT_WRITERS[name](f"{base_path}.{name}") for name in formats]
+    try:
+        for rows, cols, scores in pairs:
+            block_male_names = male_names[rows].tolist()
+            block_female_names = female_names[cols].tolist()
+            for writer in writers:
+                writer.write_block(block_male_names, block_female_names, scores)
+    finally:
+        for writer in writers:
+            writer.close()
+    manifest = {
+        "complete": True,
+        "matches": writers[0].rows if writers else 0,
+        "seconds": time.perf_counter() - start,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "files": {name: {"path": writer.path, "bytes": os.path.getsize(writer.path)} for name, writer in zip(formats, writers)},
+        **run_info,
+    }
+    with open(manifest_path + ".tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+        manifest_file.flush()
+        os.fsync(manifest_file.fileno())
+    os.replace(manifest_path + ".tmp", manifest_path)
+    _fsync_directory(manifest_path)
+    return manifest
@@ -0,0 +1,163 @@
+import collections
+import math
+
+import cairo
+
+# How a node is painted: optional fill colour, then optional stroke colour with the given width
+Style = collections.namedtuple("Style", "stroke fill line_width", defaults=(None, None, 1))
+
+# Affine transform applied to a node, in cairo.Matrix argument order
+IDENTITY = (1, 0, 0, 1, 0, 0)
+
+
+def translate(x, y):
+    return (1, 0, 0, 1, x, y)
+
+
+def scale(sx, sy=None):
+    return (sx, 0, 0, sx if sy is None else sy, 0, 0)
+
+
+class Node:
+    # One drawable: a list of path operations such as ("move_to", x, y), ("line_to", x, y),
+    # ("arc", xc, yc, r, a1, a2), ("arc_negative", ...), ("curve_to", ...) or ("close_path",),
+    # together with its style and transform. Changing any of them through update() marks it dirty.
+
+    def __init__(self, name, ops, style, transform=IDENTITY):
+        self.name = name
+        self.ops = tuple(tuple(op) for op in ops)
+        self.style = style
+        self.transform = tuple(transform)
+        self.dirty = True
+
+    def update(self, ops=None, style=None, transform=None):
+        if ops is not None:
+            self.ops = tuple(tuple(op) for op in ops)
+        if style is not None:
+            self.style = style
+        if transform is not None:
+            self.transform = tuple(transform)
+        self.dirty = True
+
+
+class Scene:
+    def __init__(self, width, height, nodes, background=(1, 1, 1)):
+        self.width = width
+        self.height = height
+        self.nodes = list(nodes)
+        self.background = background
+
+    def __getitem__(self, name):
+        for node in self.nodes:
+            if node.name == name:
+                return node
+        raise KeyError(name)
+
+
+# Paths are built once per distinct list of operations with copy_path and shared by every node,
+# scene and surface that uses the same geometry
+_path_cache = {}
+_scratch_context = cairo.Context(cairo.ImageSurface(cairo.FORMAT_A8, 1, 1))
+
+
+def build_path(ops):
+    path = _path_cache.get(ops)
+    if path is None:
+        _scratch_context.new_path()
+        for name, *args in ops:
+            getattr(_scratch_context, name)(*args)
+        path = _path_cache[ops] = _scratch_context.copy_path()
+        _scratch_context.new_path()
+    return path
+
+
+def draw_node(ctx, node):
+    style = node.style
+    ctx.save()
+    ctx.transform(cairo.Matrix(*node.transform))
+    ctx.new_path()
+    ctx.append_path(build_path(node.ops))
+    ctx.set_line_width(style.line_width)
+    if style.fill is not None:
+        ctx.set_source_rgb(*style.fill)
+        if style.stroke is not None:
+            ctx.fill_preserve()
+        else:
+            ctx.fill()
+    if style.stroke is not None:
+        ctx.set_source_rgb(*style.stroke)
+        ctx.stroke()
+    ctx.new_path()
+    ctx.restore()
+
+
+# Device-space bounding box of everything the node paints, as (x1, y1, x2, y2)
+def node_extents(ctx, node):
+    ctx.save()
+    ctx.transform(cairo.Matrix(*node.transform))
+    ctx.new_path()
+    ctx.append_path(build_path(node.ops))
+    ctx.set_line_width(node.style.line_width)
+    x1, y1, x2, y2 = ctx.stroke_extents() if node.style.stroke is not None else ctx.fill_extents()
+    corners = [ctx.user_to_device(x, y) for x in (x1, x2) for y in (y1, y2)]
+    ctx.new_path()
+    ctx.restore()
+    xs = [x for x, _ in corners]
+    ys = [y for _, y in corners]
+    # Whole pixels, so a clip to these extents has no antialiased edge
+    return math.floor(min(xs)) - 1, math.floor(min(ys)) - 1, math.ceil(max(xs)) + 1, math.ceil(max(ys)) + 1
+
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class SceneRenderer:
+    # Keeps a surface for one scene. The first render() paints everything; later calls only repaint
+    # the areas covered by dirty nodes (before and after their change), redrawing just the nodes
+    # that overlap those areas, clipped to them.
+
+    def __init__(self, scene, surface=None):
+        self.scene = scene
+        self.surface = surface or cairo.ImageSurface(cairo.FORMAT_RGB24, scene.width, scene.height)
+        self.ctx = cairo.Context(self.surface)
+        self._extents = {}
+        self.nodes_drawn = 0
+
+    def render(self):
+        ctx = self.ctx
+        damaged = []
+        if not self._extents:
+            damaged.append((0, 0, self.scene.width, self.scene.height))
+        for node in self.scene.nodes:
+            if node.dirty or id(node) not in self._extents:
+                extents = node_extents(ctx, node)
+                if id(node) in self._extents:
+                    damaged.append(self._extents[id(node)])
+                damaged.append(extents)
+                self._extents[id(node)] = extents
+                node.dirty = False
+        if not damaged:
+            return self.surface
+
+        ctx.save()
+        for x1, y1, x2, y2 in damaged:
+            ctx.rectangle(x1, y1, x2 - x1, y2 - y1)
+        ctx.clip()
+        ctx.set_source_rgb(*self.scene.background)
+        ctx.paint()
+        for node in self.scene.nodes:
+            if any(_overlaps(self._extents[id(node)], area) for area in damaged):
+                draw_node(ctx, node)
+                self.nodes_drawn += 1
+        ctx.restore()
+        self.surface.flush()
+        return self.surface
+
+
+# Paint a scene from scratch onto any context, e.g. one with its own translation and clip
+def render_scene(ctx, scene):
+    ctx.set_source_rgb(*scene.background)
+    ctx.paint()
+    for node in scene.nodes:
+        draw_node(ctx, node)
@@ -0,0 +1,40 @@
+import argparse
+import json
+import urllib.request
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+def _request(url, payload=None):
+    data = None if payload is None else json.dumps(payload).encode("utf-8")
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+# Ask the running similarity_daemon.py which candidate names are similar to each query name
+def similar_names(queries, candidates, threshold=None, url=DEFAULT_URL):
+    payload = {"queries": list(queries), "candidates": list(candidates)}
+    if threshold is not None:
+        payload["threshold"] = threshold
+    return _request(url + "/similarity", payload)["matches"]
+
+
+def stats(url=DEFAULT_URL):
+    return _request(url + "/stats")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the warm name similarity daemon")
+    parser.add_argument("names", nargs="*", help="names to look up")
+    parser.add_argument("--against", nargs="+", default=[], help="candidate names to compare with")
+    parser.add_argument("--threshold", type=float)
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--stats", action="store_true", help="print the daemon's stats instead")
+    args = parser.parse_args()
+
+    if args.stats:
+        print(json.dumps(stats(args.url), indent=4))
+    else:
+        for match in similar_names(args.names, args.against, args.threshold, args.url):
+            print(f"{match['query']}\t{match['candidate']}\t{match['similarity']:.4f}")
@@ -0,0 +1,100 @@
+import argparse
+import collections
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from Similarity import SIMILARITY_THRESHOLD, compute_embeddings, embedding_cache, iter_similar_pairs, load_model
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+LATENCY_WINDOW = 10000  # most recent requests kept for the latency percentiles
+
+# The model and the embedding cache are shared by every request thread
+embedding_lock = threading.Lock()
+latencies = collections.deque(maxlen=LATENCY_WINDOW)
+stats_lock = threading.Lock()
+request_count = 0
+started_at = time.time()
+
+
+# Score every query name against every candidate name and return the pairs at or above threshold
+def similar_names(queries, candidates, threshold=SIMILARITY_THRESHOLD):
+    queries = np.asarray(queries, dtype=object)
+    candidates = np.asarray(candidates, dtype=object)
+    with embedding_lock:
+        query_embeddings = compute_embeddings(queries)
+        candidate_embeddings = compute_embeddings(candidates)
+    matches = []
+    for rows, cols, scores in iter_similar_pairs(query_embeddings, candidate_embeddings, threshold):
+        for query, candidate, similarity in zip(queries[rows], candidates[cols], scores.tolist()):
+            matches.append({"query": query, "candidate": candidate, "similarity": similarity})
+    return matches
+
+
+def latency_stats():
+    with stats_lock:
+        window = np.array(latencies, dtype=np.float64) * 1000
+        count = request_count
+    stats = {"requests": count, "uptime_seconds": time.time() - started_at, "cache": embedding_cache.stats()}
+    if len(window):
+        p50, p90, p99 = np.percentile(window, [50, 90, 99])
+        stats["latency_ms"] = {"p50": p50, "p90": p90, "p99": p99, "max": window.max()}
+    return stats
+
+
+class SimilarityHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, latency_stats())
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        global request_count
+        if self.path != "/similarity":
+            self._send_json(404, {"error": "not found"})
+            return
+        start = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            matches = similar_names(request["queries"], request["candidates"],
+                                    request.get("threshold", SIMILARITY_THRESHOLD))
+        except (KeyError, TypeError, ValueError) as error:
+            self._send_json(400, {"error": str(error)})
+            return
+        self._send_json(200, {"matches": matches})
+        with stats_lock:
+            request_count += 1
+            latencies.append(time.perf_counter() - start)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep LaBSE loaded and answer name similarity queries over HTTP")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    load_model()
+    server = ThreadingHTTPServer((args.host, args.port), SimilarityHandler)
+    print(f"Serving name similarity on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_email_addresses import add_email_columns, generate_emails, generate_emails_streaming
+
+
+def test_streaming_matches_whole_file_when_last_chunk_has_no_comma(tmp_path):
+    input_path = str(tmp_path / "roster.csv")
+    pd.DataFrame({
+        "Student Name": ["Doe, Jane", "Smith, John, Jr", "Roe, Ann", "Madonna"],
+        "Gender": ["F", "M", "F", "F"],
+    }).to_csv(input_path, index=False)
+    generate_emails_streaming(input_path, str(tmp_path / "streamed"), formats=("csv",), chunk_size=3)
+    generate_emails(input_path, str(tmp_path / "whole"), formats=("csv",))
+    streamed = pd.read_csv(tmp_path / "streamed.csv")
+    pd.testing.assert_frame_equal(streamed, pd.read_csv(tmp_path / "whole.csv"))
+    assert streamed["Other Names"].tolist()[1] == "John, Jr"
+
+
+def test_compact_dtypes_build_the_same_addresses():
+    roster = pd.DataFrame({
+        "Student Name": ["Doe, Jane", "O'Neil, Sean", "Smith, John, Jr", "Madonna"],
+        "Gender": ["F", "M", "M", "F"],
+    })
+    compact = add_email_columns(roster.copy(), compact=True)
+    expected = add_email_columns(roster.copy(), compact=False)["Email Address"]
+    assert compact["Gender"].dtype == "category"
+    assert compact["Email Address"].astype(object).fillna("").tolist() == expected.astype(object).fillna("").tolist()
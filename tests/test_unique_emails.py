@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unique_emails import EmailAllocator
+
+
+def test_suffixed_address_does_not_collide_with_later_repeats():
+    allocated = EmailAllocator().allocate(["jdoe1@gmail.com", "jdoe@gmail.com", "jdoe@gmail.com"])
+    assert allocated.tolist() == ["jdoe1@gmail.com", "jdoe@gmail.com", "jdoe2@gmail.com"]
+    assert allocated.is_unique
+
+
+def test_issued_suffixes_are_skipped_in_later_calls():
+    allocator = EmailAllocator()
+    first = allocator.allocate(["jdoe@gmail.com", "jdoe@gmail.com", "jdoe1@gmail.com"])
+    second = allocator.allocate(["jdoe@gmail.com", "jdoe2@gmail.com", "jdoe7@gmail.com"])
+    assert first.tolist() == ["jdoe@gmail.com", "jdoe2@gmail.com", "jdoe1@gmail.com"]
+    assert second.tolist() == ["jdoe8@gmail.com", "jdoe9@gmail.com", "jdoe7@gmail.com"]
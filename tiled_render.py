@@ -0,0 +1,153 @@
+import argparse
+import collections
+import concurrent.futures
+import importlib
+import struct
+import time
+import zlib
+
+import cairo
+import numpy as np
+
+from scene_graph import render_scene
+
+TILE_SIZE = 1024  # pixels per tile side, a multiple of 16 so it can also be used as a TIFF tile
+PENDING_BANDS = 2  # rows of tiles rendered ahead of the writer, bounds memory to a few bands
+
+
+# Worker: render one tile of the scene at the given scale, translated so the tile's top-left
+# corner is at the surface origin, and return it as packed RGB rows
+def render_tile(scene, scale, x, y, width, height):
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+    ctx = cairo.Context(surface)
+    ctx.rectangle(0, 0, width, height)
+    ctx.clip()
+    ctx.translate(-x, -y)
+    ctx.scale(scale, scale)
+    render_scene(ctx, scene)
+    return surface_pixels(surface)
+
+
+# Copy an RGB24 or ARGB32 image surface out as RGB or straight-alpha RGBA rows
+def surface_pixels(surface):
+    surface.flush()
+    width, height = surface.get_width(), surface.get_height()
+    # Pixels are native-endian 32-bit (A)RGB words, i.e. B, G, R, A bytes on little-endian hosts
+    pixels = np.ndarray((height, surface.get_stride() // 4, 4), dtype=np.uint8, buffer=surface.get_data())[:, :width]
+    if surface.get_format() != cairo.FORMAT_ARGB32:
+        return np.ascontiguousarray(pixels[:, :, 2::-1])
+    rgba = np.ascontiguousarray(pixels[:, :, [2, 1, 0, 3]])
+    # Cairo stores premultiplied alpha, PNG expects straight alpha
+    alpha = rgba[:, :, 3:4].astype(np.uint16)
+    partial = (alpha > 0) & (alpha < 255)
+    if partial.any():
+        straight = np.minimum(rgba[:, :, :3].astype(np.uint16) * 255 // np.maximum(alpha, 1), 255).astype(np.uint8)
+        rgba[:, :, :3] = np.where(partial, straight, rgba[:, :, :3])
+    return rgba
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def _png_header(width, height, channels):
+    return b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6 if channels == 4 else 2, 0, 0, 0))
+
+
+def _filtered_rows(pixels):
+    filtered = np.zeros((pixels.shape[0], 1 + pixels.shape[1] * pixels.shape[2]), dtype=np.uint8)  # filter type 0
+    filtered[:, 1:] = pixels.reshape(len(pixels), -1)
+    return filtered.tobytes()
+
+
+# Encode a whole (height, width, 3 or 4) array as PNG bytes; zlib releases the GIL while compressing
+def encode_png(pixels, level=6):
+    height, width, channels = pixels.shape
+    return (_png_header(width, height, channels)
+            + _png_chunk(b"IDAT", zlib.compress(_filtered_rows(pixels), level))
+            + _png_chunk(b"IEND", b""))
+
+
+# Minimal streaming PNG encoder: rows are filtered, deflated and written as they arrive
+class PngStreamWriter:
+    def __init__(self, path, width, height):
+        self._file = open(path, "wb")
+        self._file.write(_png_header(width, height, 3))
+        self._compressor = zlib.compressobj(6)
+
+    def write_rows(self, rows):
+        data = self._compressor.compress(_filtered_rows(rows))
+        if data:
+            self._file.write(_png_chunk(b"IDAT", data))
+
+    def close(self):
+        self._file.write(_png_chunk(b"IDAT", self._compressor.flush()))
+        self._file.write(_png_chunk(b"IEND", b""))
+        self._file.close()
+
+
+# Yield the (x, y, width, height) tiles of one row of tiles
+def _band_tiles(y, width, height, tile_size):
+    return [(x, y, min(tile_size, width - x), min(tile_size, height - y)) for x in range(0, width, tile_size)]
+
+
+# Render tiles on a process pool in row order, keeping at most PENDING_BANDS rows in flight,
+# and yield each finished row of tiles as a list of RGB arrays
+def iter_tile_bands(scene, scale, width, height, tile_size=TILE_SIZE, workers=None):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        for y in range(0, height, tile_size):
+            pending.append([pool.submit(render_tile, scene, scale, *tile) for tile in _band_tiles(y, width, height, tile_size)])
+            if len(pending) >= PENDING_BANDS:
+                yield [future.result() for future in pending.popleft()]
+        while pending:
+            yield [future.result() for future in pending.popleft()]
+
+
+# Render a scene at scale times its size straight into a PNG, one row of tiles at a time
+def render_png(scene, scale, path, tile_size=TILE_SIZE, workers=None):
+    width, height = round(scene.width * scale), round(scene.height * scale)
+    writer = PngStreamWriter(path, width, height)
+    try:
+        for tiles in iter_tile_bands(scene, scale, width, height, tile_size, workers):
+            writer.write_rows(np.concatenate(tiles, axis=1))
+    finally:
+        writer.close()
+    return width, height
+
+
+# Render a scene into a tiled TIFF, writing every tile as it is finished (needs tifffile)
+def render_tiff(scene, scale, path, tile_size=TILE_SIZE, workers=None):
+    import tifffile
+
+    width, height = round(scene.width * scale), round(scene.height * scale)
+
+    def padded_tiles():
+        for tiles in iter_tile_bands(scene, scale, width, height, tile_size, workers):
+            for tile in tiles:
+                padded = np.zeros((tile_size, tile_size, 3), dtype=np.uint8)
+                padded[:tile.shape[0], :tile.shape[1]] = tile
+                yield padded
+
+    tifffile.imwrite(path, padded_tiles(), shape=(height, width, 3), dtype=np.uint8,
+                     tile=(tile_size, tile_size), photometric="rgb", compression="zlib", bigtiff=True)
+    return width, height
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a scene at poster resolution tile by tile")
+    parser.add_argument("output", help="output .png or .tif file")
+    parser.add_argument("--scene", default="drawing:house_scene", help="module:function returning a Scene")
+    parser.add_argument("--scale", type=float, default=25.0)
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    module_name, function_name = args.scene.split(":")
+    scene = getattr(importlib.import_module(module_name), function_name)()
+    render = render_tiff if args.output.lower().endswith((".tif", ".tiff")) else render_png
+    start = time.perf_counter()
+    width, height = render(scene, args.scale, args.output, args.tile_size, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {width}x{height} to {args.output} in {elapsed:.2f}s "
+          f"({width * height / elapsed / 1e6:.1f} Mpixel/s)")
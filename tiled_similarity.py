@@ -0,0 +1,93 @@
+import concurrent.futures
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+SHARDS_PER_WORKER = 4  # more shards than workers so a slow shard does not leave cores idle
+MERGE_CHUNK_SIZE = 1_000_000  # matches read back from a shard at a time
+MATCH_DTYPE = np.dtype([("row", "<i8"), ("col", "<i8"), ("score", "<f4")])
+
+
+# Scale every embedding to unit length once, so cosine similarity is a plain dot product
+def normalize_embeddings(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return embeddings / norms
+
+
+# Compute the similarity matrix of two unit-length embedding sets tile by tile and yield
+# (male indices, female indices, scores) for every pair at or above the threshold
+def iter_unit_pairs(male_unit, female_unit, threshold, block_size):
+    for i in range(0, len(male_unit), block_size):
+        male_block = np.asarray(male_unit[i:i + block_size])
+        for j in range(0, len(female_unit), block_size):
+            tile = male_block @ female_unit[j:j + block_size].T
+            rows, cols = np.nonzero(tile >= threshold)
+            if len(rows):
+                yield rows + i, cols + j, tile[rows, cols]
+
+
+# Keep the worker's BLAS/OpenMP pools at the given size so workers do not oversubscribe the machine
+def _init_worker(threads):
+    global _thread_limits
+    _thread_limits = threadpool_limits(limits=threads)
+
+
+# Score one contiguous range of male rows against every female row, reading both embedding sets
+# from the shared memory-mapped files, and write the matches to the shard's own file
+def _score_shard(male_path, female_path, dim, start, end, threshold, block_size, shard_path):
+    male_unit = np.memmap(male_path, dtype=np.float32, mode="r").reshape(-1, dim)[start:end]
+    female_unit = np.memmap(female_path, dtype=np.float32, mode="r").reshape(-1, dim)
+    count = 0
+    with open(shard_path, "wb") as shard_file:
+        for rows, cols, scores in iter_unit_pairs(male_unit, female_unit, threshold, block_size):
+            matches = np.empty(len(rows), dtype=MATCH_DTYPE)
+            matches["row"] = rows + start
+            matches["col"] = cols
+            matches["score"] = scores
+            matches.tofile(shard_file)
+            count += len(matches)
+    return count
+
+
+# Split the male axis into shards scored by a process pool, then yield the merged matches shard by
+# shard in male order. Embeddings reach the workers through memory-mapped files, never by pickling.
+def iter_sharded_pairs(male_embeddings, female_embeddings, threshold, block_size, workers=None, threads_per_worker=1,
+                       work_dir=None):
+    workers = workers or os.cpu_count() or 1
+    shard_dir = tempfile.mkdtemp(prefix="similarity_shards_", dir=work_dir)
+    try:
+        male_unit = normalize_embeddings(male_embeddings)
+        female_unit = normalize_embeddings(female_embeddings)
+        dim = male_unit.shape[1]
+        male_path = os.path.join(shard_dir, "male.f32")
+        female_path = os.path.join(shard_dir, "female.f32")
+        male_unit.tofile(male_path)
+        female_unit.tofile(female_path)
+        del male_unit, female_unit
+
+        shard_rows = -(-len(male_embeddings) // (workers * SHARDS_PER_WORKER))
+        shard_rows = max(block_size, -(-shard_rows // block_size) * block_size)
+        bounds = [(start, min(start + shard_rows, len(male_embeddings)))
+                  for start in range(0, len(male_embeddings), shard_rows)]
+        shard_paths = [os.path.join(shard_dir, f"shard_{number:05d}.bin") for number in range(len(bounds))]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(bounds) or 1),
+                                                    initializer=_init_worker,
+                                                    initargs=(threads_per_worker,)) as pool:
+            futures = [pool.submit(_score_shard, male_path, female_path, dim, start, end, threshold, block_size, path)
+                       for (start, end), path in zip(bounds, shard_paths)]
+            for future in futures:
+                future.result()
+
+        for path in shard_paths:
+            matches = np.memmap(path, dtype=MATCH_DTYPE, mode="r") if os.path.getsize(path) else []
+            for start in range(0, len(matches), MERGE_CHUNK_SIZE):
+                chunk = np.array(matches[start:start + MERGE_CHUNK_SIZE])
+                yield chunk["row"], chunk["col"], chunk["score"]
+            del matches
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
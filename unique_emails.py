@@ -0,0 +1,109 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+EMAIL_COLUMN = "Email Address"
+DIGITS = "0123456789"
+
+
+# Split addresses into (base, numeric suffix): "jdoe12@gmail.com" -> ("jdoe@gmail.com", 12).
+# Addresses without a trailing number are their own base with suffix 0.
+def split_suffix(emails):
+    bases = []
+    suffixes = []
+    for email in emails:
+        local, _, domain = email.rpartition("@")
+        stripped = local.rstrip(DIGITS)
+        if len(stripped) == len(local):
+            bases.append(email)
+            suffixes.append(0)
+        else:
+            bases.append(stripped + "@" + domain)
+            suffixes.append(int(local[len(stripped):]))
+    return np.array(bases, dtype=object), np.array(suffixes, dtype=np.int64)
+
+
+def with_suffix(base, suffix):
+    local, _, domain = base.rpartition("@")
+    return f"{local}{suffix}@{domain}"
+
+
+class EmailAllocator:
+    # Hash index from each address base to the next free numeric suffix. Every address already
+    # issued for a base has a smaller suffix, so new addresses can never collide with old ones.
+
+    def __init__(self):
+        self.next_suffix = {}
+        self.collisions_resolved = 0
+
+    def __len__(self):
+        return len(self.next_suffix)
+
+    # Remember that every suffix up to the largest one used per base is taken
+    def _reserve(self, base_codes, base_uniques, suffixes):
+        largest = pd.Series(suffixes).groupby(base_codes).max()
+        for base, suffix in zip(base_uniques[largest.index], (largest + 1).tolist()):
+            if suffix > self.next_suffix.get(base, 0):
+                self.next_suffix[base] = suffix
+
+    # Mark addresses from a previous run as taken
+    def add_existing(self, emails):
+        emails = pd.Series(emails, dtype=object).dropna().astype(str).str.strip().str.lower()
+        emails = pd.Series(emails[emails.str.contains("@", regex=False)].unique(), dtype=object)
+        if not len(emails):
+            return
+        bases, suffixes = split_suffix(emails)
+        base_codes, base_uniques = pd.factorize(bases)
+        self._reserve(base_codes, base_uniques, suffixes)
+
+    # Load issued addresses from a previous output file or from every export in a directory
+    def load_existing(self, path):
+        paths = [path]
+        if os.path.isdir(path):
+            paths = sorted(file_path for pattern in ("*.csv", "*.tsv", "*.xlsx")
+                           for file_path in glob.glob(os.path.join(path, pattern)))
+        for file_path in paths:
+            if file_path.endswith(".xlsx"):
+                frame = pd.read_excel(file_path)
+            else:
+                frame = pd.read_csv(file_path, sep="\t" if file_path.endswith(".tsv") else ",", dtype=str)
+            if EMAIL_COLUMN in frame:
+                self.add_existing(frame[EMAIL_COLUMN])
+
+    # Return the addresses made unique in one pass. The first occurrence of each address keeps it
+    # unless its suffix was already issued; every other row of a base gets the next suffix above
+    # both the base's issued suffixes and the ones kept in this call, in input order, so the
+    # result only depends on the input order. String parsing only runs once per distinct address.
+    def allocate(self, emails):
+        source_dtype = getattr(emails, "dtype", object)
+        emails = pd.Series(emails, dtype=object)
+        valid = (emails.notna() & emails.astype(str).str.contains("@", regex=False)).to_numpy()
+        candidates = emails.to_numpy()[valid].astype(str).astype(object)
+        if not len(candidates):
+            return emails.astype(source_dtype)
+        codes, uniques = pd.factorize(candidates)
+        bases, own_suffixes = split_suffix(uniques)
+        unique_base_codes, base_uniques = pd.factorize(bases)
+        base_codes = unique_base_codes[codes]
+        base_start = pd.Series(base_uniques, dtype=object).map(self.next_suffix).fillna(0).astype("int64").to_numpy()
+        own = own_suffixes[codes]
+        keep = ~pd.Series(codes).duplicated().to_numpy() & (own >= base_start[base_codes])
+        kept_largest = pd.Series(own[keep]).groupby(base_codes[keep]).max()
+        base_next = base_start.copy()
+        base_next[kept_largest.index] = np.maximum(base_next[kept_largest.index], kept_largest.to_numpy() + 1)
+        renamed = ~keep
+        suffixes = own.copy()
+        suffixes[renamed] = (base_next[base_codes[renamed]]
+                             + pd.Series(base_codes[renamed]).groupby(base_codes[renamed]).cumcount().to_numpy())
+        allocated = candidates.copy()
+        allocated[renamed] = [
+            with_suffix(base_uniques[base], suffix)
+            for base, suffix in zip(base_codes[renamed].tolist(), suffixes[renamed].tolist())
+        ]
+        self._reserve(base_codes, base_uniques, suffixes)
+        self.collisions_resolved += int(renamed.sum())
+        result = emails.copy()
+        result[valid] = allocated
+        return result.astype(source_dtype)